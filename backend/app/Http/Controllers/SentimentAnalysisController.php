@@ -60,6 +60,15 @@ private function extractTextFromFile($file)
 
     private function analyzeSentiment($text)
     {
+        // Pakai worker ML (ml/analysis_server.py) jika dikonfigurasi
+        $workerUrl = env('ML_WORKER_URL');
+        if ($workerUrl) {
+            $workerResult = $this->analyzeWithWorker($workerUrl, $text);
+            if ($workerResult) {
+                return $workerResult;
+            }
+        }
+
         $apiKey = env('GEMINI_API_KEY');
         $apiUrl = env('GEMINI_API_URL');
 
@@ -96,6 +105,40 @@ private function analyzeSentiment($text)
         }
     }
 
+    private function analyzeWithWorker($workerUrl, $text)
+    {
+        try {
+            $response = Http::timeout((int) env('ML_WORKER_TIMEOUT', 60))
+                ->post(rtrim($workerUrl, '/') . '/analyze', [
+                    'text' => $text,
+                    'service' => env('ML_WORKER_SERVICE', 'gemini'),
+                ]);
+
+            if (!$response->successful()) {
+                return null;
+            }
+
+            $result = $response->json();
+            $label = $result['label'] ?? null;
+            if (!$label) {
+                return null;
+            }
+
+            // Label worker: positif / negatif / netral
+            $sentiments = ['positif' => 'Positive', 'negatif' => 'Negative', 'netral' => 'Neutral'];
+            $defaultScores = ['positif' => 0.75, 'negatif' => 0.25, 'netral' => 0.5];
+
+            return [
+                'sentiment' => $sentiments[$label] ?? 'Neutral',
+                'score' => $result['score'] ?? ($defaultScores[$label] ?? 0.5),
+                'details' => $result['summary'] ?? ''
+            ];
+        } catch (\Exception $e) {
+            // Worker tidak aktif: lanjut ke jalur Gemini langsung
+            return null;
+        }
+    }
+
     private function parseGeminiResponse($geminiText)
     {
         // Ekstrak sentimen dari response Gemini
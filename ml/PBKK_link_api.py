@@ -1,10 +1,24 @@
-import requests
+import argparse
+import asyncio
 import json
+import logging
 import re
-from bs4 import BeautifulSoup
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
 from readability import Document
 from dotenv import load_dotenv
 import os
+from cache_utils import cache_enabled, get_cache, make_key, normalize_text
+from local_sentiment import analyze_local
+import http_utils
+from html_extract import html_to_text
+from batch_utils import ResultWriter, load_done_ids
+from metrics import configure_logging, observe_stage, request_context, stage, write_prometheus
+from PBKK_script_api import bert_single_shape, extract_sentiment_label, get_result_cache
+
+logger = logging.getLogger(__name__)
 
 # ============================
 # Load API Keys dari .env
@@ -15,112 +29,408 @@ API_KEY_DEEPSEEK = os.getenv("API_KEY_DEEPSEEK")
 API_KEY_BERT = os.getenv("API_KEY_BERT")
 
 # ============================
-# Endpoint Model
+# Endpoint Model (bisa diganti lewat .env)
 # ============================
-ENDPOINT_GEMINI = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-ENDPOINT_DEEPSEEK = "https://openrouter.ai/api/v1/chat/completions"
-ENDPOINT_BERT = "https://api-inference.huggingface.co/models/nlptown/bert-base-multilingual-uncased-sentiment"
+ENDPOINT_GEMINI = os.getenv("ENDPOINT_GEMINI", "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent")
+ENDPOINT_DEEPSEEK = os.getenv("ENDPOINT_DEEPSEEK", "https://openrouter.ai/api/v1/chat/completions")
+ENDPOINT_BERT = os.getenv("ENDPOINT_BERT", "https://api-inference.huggingface.co/models/nlptown/bert-base-multilingual-uncased-sentiment")
+
+# Model & template prompt (juga menjadi bagian kunci cache)
+MODELS = {
+    "gemini": "gemini-2.0-flash",
+    "deepseek": "deepseek-chat",
+    "bert": "nlptown/bert-base-multilingual-uncased-sentiment",
+}
+PROMPTS = {
+    "gemini": "Analisis sentimen dari teks berikut: '{text}'. Tentukan apakah positif, negatif, atau netral. Jelaskan alasannya.",
+    "deepseek": "Analisis sentimen dari teks berikut: '{text}'. Apakah positif, negatif, atau netral? Berikan alasan singkat.",
+    "bert": "{text}",
+}
+
+# Jumlah redirect maksimal saat URL diperiksa per langkah (lihat download_article)
+MAX_REDIRECTS = 5
+
+# Cache artikel per URL (ETag/Last-Modified + teks hasil ekstraksi)
+URL_CACHE_TTL = float(os.getenv("URL_CACHE_TTL", 24 * 3600))
+URL_CACHE_MAX_ENTRIES = int(os.getenv("URL_CACHE_MAX_ENTRIES", 5000))
+
+_url_counters = {"requests": 0, "not_modified": 0, "modified": 0, "uncached": 0}
+_url_counters_lock = threading.Lock()
 
 
 # ============================
 # Fungsi: Ambil teks dari URL
 # ============================
-def fetch_article_text(url):
-    """Ambil teks utama dari link berita"""
-    print(f"🔗 Mengambil konten dari {url} ...")
+def _count_url(name):
+    with _url_counters_lock:
+        _url_counters[name] += 1
+
+
+def get_url_cache():
+    return get_cache("urls", ttl=URL_CACHE_TTL, max_entries=URL_CACHE_MAX_ENTRIES)
+
+
+def get_url_cache_stats():
+    """Statistik cache URL: jumlah request, 304 (not_modified), halaman berubah, dan hit rate"""
+    with _url_counters_lock:
+        stats = dict(_url_counters)
+    stats["revalidation_hit_rate"] = round(stats["not_modified"] / stats["requests"], 4) if stats["requests"] else 0.0
+    stats["cache"] = get_url_cache().stats()
+    return stats
+
+
+def _get_checked(url, headers, url_guard):
+    """GET yang mengikuti redirect sendiri dan memanggil `url_guard(url)` sebelum setiap langkah."""
+    for _ in range(MAX_REDIRECTS + 1):
+        url_guard(url)
+        resp = http_utils.get(url, headers=headers, timeout=30, allow_redirects=False)
+        if not resp.is_redirect:
+            return resp
+        url = urljoin(url, resp.headers["Location"])
+        resp.close()
+    raise ValueError(f"Lebih dari {MAX_REDIRECTS} redirect.")
+
+
+def download_article(url, use_cache=True, url_guard=None):
+    """Unduh HTML dengan conditional GET memakai ETag/Last-Modified yang tersimpan.
+
+    Mengembalikan (html, cached_text, validators). Jika server membalas 304,
+    html bernilai None dan cached_text berisi teks artikel dari cache sehingga
+    parsing bisa dilewati. `url_guard` (jika diisi) dipanggil untuk URL awal
+    dan setiap tujuan redirect; ia melempar exception untuk menolak URL.
+    """
+    use_cache = use_cache and cache_enabled()
     headers = {"User-Agent": "Mozilla/5.0"}
-    resp = requests.get(url, headers=headers, timeout=30)
+    entry = get_url_cache().get(make_key("url", url)) if use_cache else None
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    _count_url("requests")
+    if url_guard:
+        resp = _get_checked(url, headers, url_guard)
+    else:
+        resp = http_utils.get(url, headers=headers, timeout=30)
+    if resp.status_code == 304 and entry:
+        _count_url("not_modified")
+        return None, entry["text"], {"etag": entry.get("etag"), "last_modified": entry.get("last_modified")}
     resp.raise_for_status()
+    _count_url("modified" if entry else "uncached")
+    validators = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+    return resp.text, None, validators
+
+
+def store_article(url, text, validators, use_cache=True):
+    """Simpan teks artikel + validator di cache URL (hanya jika server memberi ETag/Last-Modified)"""
+    if not (use_cache and cache_enabled()) or not text:
+        return
+    if validators.get("etag") or validators.get("last_modified"):
+        get_url_cache().set(make_key("url", url), {"text": text, **validators})
 
-    html = resp.text
+
+def extract_article_text(html):
+    """Ambil teks artikel utama dari HTML (readability + extractor teks cepat).
+
+    Tidak mencatat tahap sendiri karena juga dijalankan di process pool,
+    tempat metrik tidak sampai ke proses utama; pemanggil yang mencatat "html_clean".
+    """
     doc = Document(html)
     article_html = doc.summary(html_partial=True)
-    soup = BeautifulSoup(article_html, "html.parser")
-    text = soup.get_text(separator=" ")
+    text = html_to_text(article_html, separator=" ", strip=False)
     text = re.sub(r"\s+", " ", text)
     return text.strip()
 
 
+def fetch_article_text(url, use_cache=True, url_guard=None):
+    """Ambil teks utama dari link berita (halaman yang tidak berubah diambil dari cache)"""
+    logger.info(f"🔗 Mengambil konten dari {url} ...")
+    with stage("fetch_url"):
+        html, cached_text, validators = download_article(url, use_cache=use_cache, url_guard=url_guard)
+    if cached_text is not None:
+        return cached_text
+    with stage("html_clean"):
+        text = extract_article_text(html)
+    store_article(url, text, validators, use_cache=use_cache)
+    return text
+
+
 # ============================
 # Fungsi: Analisis teks via API
 # ============================
-def analyze_text(text, api_service="gemini"):
-    """Kirim teks ke layanan AI pilihan"""
+def result_cache_key(text, api_service):
+    """Kunci cache: hash dari teks ternormalisasi, layanan, model, dan template prompt.
+
+    Rumusnya sama dengan PBKK_script_api.result_cache_key, sehingga hasil BERT
+    (model & prompt sama) dipakai bersama oleh kedua modul lewat get_result_cache().
+    """
+    return make_key(api_service, MODELS.get(api_service), PROMPTS.get(api_service), normalize_text(text))
+
+
+def invalidate_cached_result(text, api_service="gemini"):
+    """Hapus hasil analisis yang tersimpan di cache untuk teks & layanan ini."""
+    return get_result_cache().invalidate(result_cache_key(text, api_service))
+
+
+def analyze_text(text, api_service="gemini", use_cache=True):
+    """Kirim teks ke layanan AI pilihan (hasil disimpan di cache lokal)"""
+    if api_service == "local":
+        return analyze_local(text)
+    if api_service not in PROMPTS:
+        return {"_error": f"Layanan '{api_service}' tidak dikenali."}
+
+    use_cache = use_cache and cache_enabled()
+    if use_cache:
+        cache = get_result_cache()
+        cache_key = result_cache_key(text, api_service)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return bert_single_shape(cached) if api_service == "bert" else cached
+
+    prompt = PROMPTS[api_service].format(text=text)
+    with stage("provider_call", provider=api_service) as call:
+        response = _post_to_provider(api_service, prompt)
+        if not response.ok:
+            call.status = "error"
+
+    if not response.ok:
+        body = response.text or ''
+        snippet = (body[:1000] + '...') if len(body) > 1000 else body
+        return {"_error": f"Error saat menghubungi API {api_service}: {response.status_code} - {snippet}"}
+
+    with stage("json_decode", provider=api_service):
+        result = response.json()
+    if api_service == "bert":
+        # Bentuk yang sama dengan yang disimpan PBKK_script_api untuk kunci cache ini
+        result = bert_single_shape(result)
+    # Hanya respons sukses yang disimpan
+    if use_cache:
+        cache.set(cache_key, result)
+    return result
+
+
+def _post_to_provider(api_service, prompt):
+    """Kirim prompt ke endpoint provider dan kembalikan respons mentahnya"""
     if api_service == "gemini":
         payload = {
             "contents": [
                 {
                     "parts": [
                         {
-                            "text": f"Analisis sentimen dari teks berikut: '{text}'. "
-                                    f"Tentukan apakah positif, negatif, atau netral. Jelaskan alasannya."
+                            "text": prompt
                         }
                     ]
                 }
             ]
         }
-        response = requests.post(
+        response = http_utils.post(
             f"{ENDPOINT_GEMINI}?key={API_KEY_GEMINI}",
             headers={"Content-Type": "application/json"},
-            json=payload
+            json=payload,
+            provider=api_service
         )
-        return response.json()
 
     elif api_service == "deepseek":
         payload = {
-            "model": "deepseek-chat",
+            "model": MODELS["deepseek"],
             "messages": [
                 {
                     "role": "user",
-                    "content": f"Analisis sentimen dari teks berikut: '{text}'. "
-                               f"Apakah positif, negatif, atau netral? Berikan alasan singkat."
+                    "content": prompt
                 }
             ]
         }
-        response = requests.post(
+        response = http_utils.post(
             ENDPOINT_DEEPSEEK,
             headers={
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {API_KEY_DEEPSEEK}"
             },
-            json=payload
+            json=payload,
+            provider=api_service
         )
-        return response.json()
 
-    elif api_service == "bert":
-        payload = {"inputs": text}
-        response = requests.post(
+    else:
+        payload = {"inputs": prompt}
+        response = http_utils.post(
             ENDPOINT_BERT,
             headers={"Authorization": f"Bearer {API_KEY_BERT}"},
-            json=payload
+            json=payload,
+            provider=api_service
         )
-        return response.json()
+    return response
 
-    else:
-        return {"_error": f"Layanan '{api_service}' tidak dikenali."}
+
+# ============================
+# Fungsi: Analisis banyak link sekaligus
+# ============================
+class DomainThrottle:
+    """Batasi koneksi per domain dan beri jeda sopan antar request ke domain yang sama"""
+
+    def __init__(self, per_domain=2, delay=1.0):
+        self.per_domain = per_domain
+        self.delay = delay
+        self._semaphores = {}
+        self._locks = {}
+        self._last_start = {}
+
+    async def acquire(self, domain):
+        if domain not in self._semaphores:
+            self._semaphores[domain] = asyncio.Semaphore(self.per_domain)
+            self._locks[domain] = asyncio.Lock()
+        await self._semaphores[domain].acquire()
+        # Jeda antar awal request ke domain yang sama
+        async with self._locks[domain]:
+            wait = self._last_start.get(domain, 0) + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_start[domain] = time.monotonic()
+
+    def release(self, domain):
+        self._semaphores[domain].release()
+
+
+async def _process_url(url, api_service, throttle, parse_pool, limit):
+    """Unduh, ekstrak, dan analisis satu URL; kembalikan record hasil (error dicatat di "_error")"""
+    loop = asyncio.get_running_loop()
+    record = {"id": url}
+    domain = urlsplit(url).netloc.lower()
+    async with limit:
+        # Satu request ID per URL; task asyncio & to_thread membawa context-nya sendiri
+        with request_context():
+            try:
+                start = time.perf_counter()
+                await throttle.acquire(domain)
+                try:
+                    html, text, validators = await asyncio.to_thread(download_article, url)
+                finally:
+                    throttle.release(domain)
+                record["fetch_time"] = round(time.perf_counter() - start, 3)
+
+                if text is None:
+                    # Parsing HTML berat untuk CPU: jalankan di process pool agar event loop tetap bebas
+                    start = time.perf_counter()
+                    text = await loop.run_in_executor(parse_pool, extract_article_text, html)
+                    elapsed = time.perf_counter() - start
+                    observe_stage("html_clean", elapsed)
+                    record["parse_time"] = round(elapsed, 3)
+                    store_article(url, text, validators)
+                else:
+                    record["parse_time"] = 0.0
+                record["chars"] = len(text)
+                if not text:
+                    record["_error"] = "Teks artikel tidak ditemukan."
+                    return record
+
+                start = time.perf_counter()
+                result = await asyncio.to_thread(analyze_text, text, api_service)
+                record["analyze_time"] = round(time.perf_counter() - start, 3)
+                record["result"] = result
+                label, _ = extract_sentiment_label(api_service, result)
+                record["label"] = label
+                if isinstance(result, dict) and result.get("_error"):
+                    record["_error"] = result["_error"]
+                elif label is None:
+                    record["_error"] = "Label sentimen tidak ditemukan di jawaban provider."
+            except Exception as e:
+                record["_error"] = str(e)
+    return record
+
+
+async def analyze_urls(urls, api_service="gemini", output_path=None, per_domain=2, delay=1.0,
+                       concurrency=32, parse_workers=None):
+    """Analisis banyak URL secara bersamaan dengan asyncio.
+
+    Setiap URL diunduh (maksimal `per_domain` koneksi dan jeda `delay` detik
+    per domain), diparsing di process pool, lalu langsung dianalisis begitu
+    unduhannya selesai. Jika `output_path` diisi, hasil ditulis bertahap ke
+    JSONL/CSV dan URL yang sudah berhasil di file tersebut dilewati (yang
+    gagal, termasuk jawaban provider tanpa label, dicoba lagi).
+    Mengembalikan list record (kosong jika hasil ditulis ke file).
+    """
+    done_ids = load_done_ids(output_path) if output_path else set()
+    urls = [u for u in dict.fromkeys(urls) if u not in done_ids]
+    if done_ids:
+        logger.info(f"Melanjutkan: {len(done_ids)} URL sudah ada di {output_path}")
+    logger.info(f"🔗 Memproses {len(urls)} URL dengan layanan {api_service.upper()} ...")
+
+    loop = asyncio.get_running_loop()
+    # Thread untuk I/O (unduh & panggil API) disesuaikan dengan batas concurrency
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    throttle = DomainThrottle(per_domain=per_domain, delay=delay)
+    limit = asyncio.Semaphore(concurrency)
+    writer = ResultWriter(output_path, fieldnames=["id", "chars", "fetch_time", "parse_time", "analyze_time", "label", "result", "_error"]) if output_path else None
+    records = []
+    counts = {"ok": 0, "failed": 0}
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool:
+        tasks = [asyncio.create_task(_process_url(url, api_service, throttle, parse_pool, limit)) for url in urls]
+        for task in asyncio.as_completed(tasks):
+            record = await task
+            if record.get("_error"):
+                counts["failed"] += 1
+            else:
+                counts["ok"] += 1
+            if writer:
+                writer.write(record)
+            else:
+                records.append(record)
+
+    if writer:
+        writer.close()
+    logger.info(f"Selesai: {counts['ok']} berhasil, {counts['failed']} gagal.")
+    return records
 
 
 # ============================
 # Main Program
 # ============================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analisis sentimen dari link berita.")
+    parser.add_argument("--urls", help="File berisi daftar URL (satu per baris) untuk mode bulk")
+    parser.add_argument("--service", default="gemini", help="Layanan: gemini / deepseek / bert / local (default: gemini)")
+    parser.add_argument("--output", help="File hasil bulk (.jsonl atau .csv, default: <urls>_results.jsonl)")
+    parser.add_argument("--per-domain", type=int, default=2, help="Maksimal koneksi bersamaan per domain (default: 2)")
+    parser.add_argument("--delay", type=float, default=1.0, help="Jeda minimum antar request ke domain yang sama, detik (default: 1.0)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maksimal URL yang diproses bersamaan (default: 32)")
+    parser.add_argument("--log-level", default=None, help="Level log: DEBUG, INFO, WARNING, ERROR (default: SENTIMENT_LOG_LEVEL, INFO)")
+    parser.add_argument("--log-json", action="store_true", help="Tulis log sebagai baris JSON (dengan request_id)")
+    parser.add_argument("--metrics", help="Simpan metrik per tahap (format Prometheus) ke file ini setelah selesai")
+    args = parser.parse_args()
+    configure_logging(level=args.log_level, json_logs=True if args.log_json else None)
+
+    if args.urls:
+        with open(args.urls, "r", encoding="utf-8") as f:
+            url_list = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        output = args.output or f"{os.path.splitext(args.urls)[0]}_results.jsonl"
+        asyncio.run(analyze_urls(url_list, api_service=args.service, output_path=output,
+                                 per_domain=args.per_domain, delay=args.delay, concurrency=args.concurrency))
+        if args.metrics:
+            write_prometheus(args.metrics)
+        raise SystemExit(0)
+
     print("=" * 60)
     print("🧩  ANALISIS SENTIMEN DARI LINK BERITA  🧩")
     print("=" * 60)
 
     url = input("Masukkan link berita: ").strip()
-    service = input("Pilih layanan (gemini / deepseek / bert): ").strip().lower()
+    service = input("Pilih layanan (gemini / deepseek / bert / local): ").strip().lower()
+
+    with request_context():
+        try:
+            article_text = fetch_article_text(url)
+            print(f"\n✅ Teks berhasil diambil ({len(article_text)} karakter pertama):")
+            print(article_text[:300] + "...\n")
 
-    try:
-        article_text = fetch_article_text(url)
-        print(f"\n✅ Teks berhasil diambil ({len(article_text)} karakter pertama):")
-        print(article_text[:300] + "...\n")
+            print(f"🚀 Mengirim ke model {service.upper()} ...\n")
+            result = analyze_text(article_text, api_service=service)
 
-        print(f"🚀 Mengirim ke model {service.upper()} ...\n")
-        result = analyze_text(article_text, api_service=service)
+            print("=== HASIL ANALISIS ===")
+            print(json.dumps(result, indent=2, ensure_ascii=False))
 
-        print("=== HASIL ANALISIS ===")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        except Exception as e:
+            print(f"❌ Terjadi kesalahan: {e}")
 
-    except Exception as e:
-        print(f"❌ Terjadi kesalahan: {e}")
+    if args.metrics:
+        write_prometheus(args.metrics)
@@ -1,12 +1,30 @@
 import requests
 import json
+import logging
 import os
 import sys
 import argparse
-from bs4 import BeautifulSoup
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 # Pastikan Anda punya file ocr_utils.py atau hapus/sesuaikan impor ini
 from ocr_utils import extract_text_from_image
+from cache_utils import cache_enabled, get_cache, make_key, normalize_text
+from batch_utils import ResultWriter, iter_batch_items, load_done_ids, run_batch
+from local_sentiment import analyze_local, analyze_local_many
+import http_utils
+from html_extract import html_to_text
+from chunking import chunk_token_budget, estimate_tokens, merge_chunk_labels, split_into_chunks, trim_to_token_budget
+import near_duplicate
+import routing
+from structured_output import MAX_OUTPUT_TOKENS, StructuredOutputError, gemini_generation_config, openrouter_response_format, parse_response
+from metrics import configure_logging, new_request_id, observe_stage, request_context, stage, write_prometheus
+import worker_client
+
+logger = logging.getLogger(__name__)
 
 # Load API keys dari file .env
 # Pertama coba load dari CWD; jika kunci tidak ditemukan, coba load dari folder skrip (ml/).
@@ -23,7 +41,7 @@ API_KEY_GEMINI = os.getenv("API_KEY_GEMINI")
 API_KEY_DEEPSEEK = os.getenv("API_KEY_DEEPSEEK")
 API_KEY_BERT = os.getenv("API_KEY_BERT")
 
-# Print status singkat (tanpa mengekspos nilai penuh) agar mudah debug
+# Status singkat (tanpa mengekspos nilai penuh) agar mudah debug
 def _mask(k):
     if not k:
         return None
@@ -31,15 +49,65 @@ def _mask(k):
         return k[:2] + '...' + k[-2:]
     return k[:4] + '...' + k[-4:]
 
-print("Loaded API keys:")
-print(f" - GEMINI: {'yes' if API_KEY_GEMINI else 'no'}")
-print(f" - DEEPSEEK: {'yes' if API_KEY_DEEPSEEK else 'no'}")
-print(f" - BERT: {'yes' if API_KEY_BERT else 'no'}")
+def log_key_status():
+    logger.info("Loaded API keys:")
+    logger.info(f" - GEMINI: {'yes' if API_KEY_GEMINI else 'no'}")
+    logger.info(f" - DEEPSEEK: {'yes' if API_KEY_DEEPSEEK else 'no'}")
+    logger.info(f" - BERT: {'yes' if API_KEY_BERT else 'no'}")
+
+# Endpoint untuk setiap API (bisa diganti lewat .env, misalnya ke server stub benchmark)
+ENDPOINT_GEMINI = os.getenv("ENDPOINT_GEMINI", "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent")
+ENDPOINT_DEEPSEEK = os.getenv("ENDPOINT_DEEPSEEK", "https://openrouter.ai/api/v1/chat/completions")
+ENDPOINT_BERT = os.getenv("ENDPOINT_BERT", "https://api-inference.huggingface.co/models/nlptown/bert-base-multilingual-uncased-sentiment")
+# Endpoint streaming Gemini (Server-Sent Events); default diturunkan dari ENDPOINT_GEMINI
+ENDPOINT_GEMINI_STREAM = os.getenv("ENDPOINT_GEMINI_STREAM", ENDPOINT_GEMINI.replace(":generateContent", ":streamGenerateContent"))
+
+# Model & prompt per layanan (juga dipakai sebagai bagian dari kunci cache)
+MODEL_GEMINI = "gemini-2.0-flash"
+MODEL_DEEPSEEK = "deepseek-chat"
+MODEL_BERT = "nlptown/bert-base-multilingual-uncased-sentiment"
+PROMPT_GEMINI = "Analisis sentimen dari teks berikut: '{text}'. Apakah sentimennya positif, negatif, atau netral? Berikan alasannya dan highlight kata-kata penyebabnya."
+PROMPT_DEEPSEEK = "Analisis sentimen dari teks berikut: '{text}'. Tentukan apakah sentimennya positif, negatif, atau netral. Berikan alasannya dan highlight kata-kata yang relevan."
+PROMPT_BERT = "{text}"
+# Prompt jawaban ringkas (JSON sesuai schema di structured_output.py)
+PROMPT_COMPACT = "Tentukan sentimen teks berita berikut: positif, negatif, atau netral. Jawab hanya dengan JSON: label, score (keyakinan 0-1), dan highlights (maksimal 5 kata dari teks yang paling menentukan sentimen). Teks: '{text}'"
+
+# Layanan default untuk perbandingan; "local" = engine leksikon offline (local_sentiment.py)
+DEFAULT_SERVICES = ["gemini", "deepseek", "bert"]
+AVAILABLE_SERVICES = DEFAULT_SERVICES + ["local"]
+# Layanan yang bisa mengirim jawaban bertahap (lihat stream_analyze_text)
+STREAMING_SERVICES = ["gemini", "deepseek"]
+
+# Layanan LLM menjawab JSON ringkas; penjelasan teks bebas hanya jika diminta (verbose)
+VERBOSE_OUTPUT = os.getenv("SENTIMENT_VERBOSE", "0").lower() in ("1", "true", "yes", "on")
+
+# Anggaran token input; teks yang lebih panjang dipangkas (bagian awal dipertahankan). 0 = tidak dipangkas
+INPUT_TOKEN_BUDGET = int(os.getenv("SENTIMENT_INPUT_TOKENS", 0))
+
+# Jika API remote error/timeout, pakai engine lokal sebagai cadangan (SENTIMENT_LOCAL_FALLBACK=0 untuk mematikan)
+LOCAL_FALLBACK = os.getenv("SENTIMENT_LOCAL_FALLBACK", "1").lower() not in ("0", "false", "no", "off")
+
+# Batch inferensi BERT: jumlah teks & total ukuran (byte UTF-8) per request
+BERT_BATCH_SIZE = int(os.getenv("BERT_BATCH_SIZE", 16))
+BERT_BATCH_MAX_BYTES = int(os.getenv("BERT_BATCH_MAX_BYTES", 200000))
+
+# Jumlah bagian teks panjang yang dianalisis bersamaan (lihat chunking.py)
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", 4))
+
+# Cache hasil analisis (lihat cache_utils.py)
+RESULT_CACHE_TTL = float(os.getenv("SENTIMENT_CACHE_TTL", 7 * 24 * 3600))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", 10000))
 
-# Endpoint untuk setiap API
-ENDPOINT_GEMINI = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-ENDPOINT_DEEPSEEK = "https://openrouter.ai/api/v1/chat/completions"
-ENDPOINT_BERT = "https://api-inference.huggingface.co/models/nlptown/bert-base-multilingual-uncased-sentiment"
+# Teks hampir sama (MinHash, lihat near_duplicate.py) memakai ulang hasil cache teks aslinya.
+# BERT tidak ikut karena hasilnya list dan tidak bisa diberi penanda "_derived_from".
+NEAR_DUP_ENABLED = os.getenv("SENTIMENT_NEAR_DUP", "1").lower() not in ("0", "false", "no", "off")
+NEAR_DUP_THRESHOLD = float(os.getenv("SENTIMENT_NEAR_DUP_THRESHOLD", 0.8))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("SENTIMENT_NEAR_DUP_MAX_ENTRIES", 1000000))
+NEAR_DUP_SERVICES = ["gemini", "deepseek"]
+
+# Urutan awal provider untuk mode routing (satu jawaban); selanjutnya diurutkan menurut
+# latensi & error rate yang teramati (lihat routing.py)
+ROUTE_SERVICES = [s.strip() for s in os.getenv("ROUTE_SERVICES", "gemini,deepseek,bert").split(",") if s.strip()]
 
 
 def normalize_api_result(api_service, result):
@@ -50,7 +118,30 @@ def normalize_api_result(api_service, result):
     if not result:
         return None
 
+    # Hasil teks panjang: ringkasan dokumen + hasil tiap bagian beserta posisinya
+    if isinstance(result, dict) and result.get("_chunked"):
+        service = result["_chunked"]
+        label = (result.get("label") or "tidak diketahui").capitalize()
+        lines = [f"{label} ({result.get('score', 0):.3f}) dari {len(result['chunks'])} bagian teks"]
+        for i, chunk in enumerate(result["chunks"], 1):
+            lines.append(f"[Bagian {i}, karakter {chunk['start']}-{chunk['end']}] "
+                         f"{format_service_result(service, chunk['result'])}")
+        return "\n\n".join(lines)
+
+    # Hasil fallback lokal membawa nama provider aslinya
+    if isinstance(result, dict) and result.get("_provider"):
+        api_service = result["_provider"]
+
     try:
+        # Hasil engine lokal dan jawaban ringkas (JSON) sudah berisi label, score dan highlights
+        if api_service == "local" or (isinstance(result, dict) and result.get("_structured")):
+            summary = f"{str(result.get('label', '')).capitalize()} ({result.get('score', 0):.3f})"
+            if result.get("highlights"):
+                summary += f" - kata kunci: {', '.join(result['highlights'])}"
+            if result.get("_fallback_from"):
+                summary = f"[fallback lokal untuk {result['_fallback_from']}] {summary}"
+            return summary
+
         if api_service == "gemini":
             # Gemini responses commonly have: {"candidates": [{"content": {"parts": [{"text": ...}]}}]}
             if isinstance(result, dict):
@@ -87,6 +178,9 @@ def normalize_api_result(api_service, result):
         if api_service == "bert":
             # HuggingFace inference often returns a list of {label, score}
             if isinstance(result, list):
+                # ... or one such list per input: [[{label, score}, ...]]
+                if result and isinstance(result[0], list):
+                    result = result[0]
                 labels = []
                 for item in result:
                     if isinstance(item, dict):
@@ -103,31 +197,92 @@ def normalize_api_result(api_service, result):
     except Exception:
         return json.dumps(result, indent=2, ensure_ascii=False)
 
-def clean_html_text(html_text):
-    """Menghapus tag HTML dari teks."""
-    soup = BeautifulSoup(html_text, 'html.parser')
-    return soup.get_text(separator=' ', strip=True)
+LABEL_WORDS = {
+    "positif": "positif", "positive": "positif",
+    "negatif": "negatif", "negative": "negatif",
+    "netral": "netral", "neutral": "netral",
+}
+LABEL_ANY_RE = re.compile(r"\b(positif|positive|negatif|negative|netral|neutral)\b", re.IGNORECASE)
+# Utamakan label yang muncul setelah kata "sentimen", misalnya "Sentimen: **Negatif**"
+LABEL_AFTER_SENTIMENT_RE = re.compile(
+    r"sentimen\w*\W+(?:\w+\W+){0,6}?(positif|positive|negatif|negative|netral|neutral)\b", re.IGNORECASE
+)
+
+def extract_sentiment_label(api_service, result):
+    """Ambil label sentimen ("positif"/"negatif"/"netral") dan keyakinannya dari hasil API.
 
-def get_api_config(api_service):
-    """Mengambil konfigurasi API berdasarkan nama layanan."""
-    # Pastikan API Keys sudah terisi, jika tidak beri peringatan
-    if not all([API_KEY_GEMINI, API_KEY_DEEPSEEK, API_KEY_BERT]):
-        print("PERINGATAN: Tidak semua API Key ditemukan di file .env. Pastikan variabel API_KEY_GEMINI, API_KEY_DEEPSEEK, dan API_KEY_BERT sudah diatur.")
+    Mengembalikan (label, score); score None jika provider tidak memberi angka
+    keyakinan, dan (None, None) jika label tidak bisa ditentukan.
+    """
+    if not result or (isinstance(result, dict) and result.get("_error")):
+        return None, None
+    if isinstance(result, dict) and (result.get("_chunked") or result.get("_structured")
+                                     or result.get("_provider") == "local"):
+        return result.get("label"), result.get("score")
+
+    if api_service == "bert" and isinstance(result, list):
+        # HF bisa mengembalikan [[{label, score}, ...]] untuk satu input
+        items = result[0] if result and isinstance(result[0], list) else result
+        groups = {}
+        for item in items:
+            if not isinstance(item, dict) or not str(item.get("label", ""))[:1].isdigit():
+                continue
+            stars = int(str(item["label"])[0])
+            label = "negatif" if stars <= 2 else ("netral" if stars == 3 else "positif")
+            groups[label] = groups.get(label, 0.0) + float(item.get("score") or 0)
+        if groups:
+            label = max(groups, key=groups.get)
+            return label, round(groups[label], 4)
+        return None, None
+
+    text = normalize_api_result(api_service, result) or ""
+    match = LABEL_AFTER_SENTIMENT_RE.search(text) or LABEL_ANY_RE.search(text)
+    if not match:
+        return None, None
+    return LABEL_WORDS[match.group(1).lower()], None
 
+@stage("html_clean")
+def clean_html_text(html_text, extractor=None):
+    """Menghapus tag HTML dari teks.
+
+    Memakai extractor lxml streaming jika tersedia (HTML_EXTRACTOR=bs4 untuk jalur BeautifulSoup).
+    """
+    return html_to_text(html_text, separator=' ', strip=True, extractor=extractor)
+
+_warned_missing_keys = False
+
+def get_api_config(api_service, verbose=None):
+    """Mengambil konfigurasi API berdasarkan nama layanan.
+
+    Gemini dan DeepSeek diminta menjawab JSON ringkas (label, score,
+    highlights) dengan batas token output; `verbose=True` (default
+    SENTIMENT_VERBOSE) memakai prompt lama yang meminta alasan dalam teks bebas.
+    """
+    # Pastikan API Keys sudah terisi, jika tidak beri peringatan (sekali per proses)
+    global _warned_missing_keys
+    if not all([API_KEY_GEMINI, API_KEY_DEEPSEEK, API_KEY_BERT]) and not _warned_missing_keys:
+        _warned_missing_keys = True
+        logger.warning("PERINGATAN: Tidak semua API Key ditemukan di file .env. Pastikan variabel API_KEY_GEMINI, API_KEY_DEEPSEEK, dan API_KEY_BERT sudah diatur.")
+
+    verbose = VERBOSE_OUTPUT if verbose is None else verbose
     config = {
         "gemini": {
             "key": API_KEY_GEMINI,
             "url": ENDPOINT_GEMINI,
+            "model": MODEL_GEMINI,
+            "prompt": PROMPT_GEMINI,
             "payload_template": lambda text: {
-                "contents": [{"parts": [{"text": f"Analisis sentimen dari teks berikut: '{text}'. Apakah sentimennya positif, negatif, atau netral? Berikan alasannya dan highlight kata-kata penyebabnya."}]}]
+                "contents": [{"parts": [{"text": PROMPT_GEMINI.format(text=text)}]}]
             }
         },
         "deepseek": {
             "key": API_KEY_DEEPSEEK,
             "url": ENDPOINT_DEEPSEEK,
+            "model": MODEL_DEEPSEEK,
+            "prompt": PROMPT_DEEPSEEK,
             "payload_template": lambda text: {
-                "model": "deepseek-chat",
-                "messages": [{"role": "user", "content": f"Analisis sentimen dari teks berikut: '{text}'. Tentukan apakah sentimennya positif, negatif, atau netral. Berikan alasannya dan highlight kata-kata yang relevan."}]
+                "model": MODEL_DEEPSEEK,
+                "messages": [{"role": "user", "content": PROMPT_DEEPSEEK.format(text=text)}]
             },
             "headers": {
                 "Content-Type": "application/json",
@@ -137,155 +292,1004 @@ def get_api_config(api_service):
         "bert": {
             "key": API_KEY_BERT,
             "url": ENDPOINT_BERT,
+            "model": MODEL_BERT,
+            "prompt": PROMPT_BERT,
             "payload_template": lambda text: {"inputs": text},
             "headers": {"Authorization": f"Bearer {API_KEY_BERT}"}
         }
     }
+    if not verbose:
+        config["gemini"].update({
+            "prompt": PROMPT_COMPACT,
+            "structured": True,
+            "payload_template": lambda text: {
+                "contents": [{"parts": [{"text": PROMPT_COMPACT.format(text=text)}]}],
+                "generationConfig": gemini_generation_config(),
+            },
+        })
+        config["deepseek"].update({
+            "prompt": PROMPT_COMPACT,
+            "structured": True,
+            "payload_template": lambda text: {
+                "model": MODEL_DEEPSEEK,
+                "messages": [{"role": "user", "content": PROMPT_COMPACT.format(text=text)}],
+                "response_format": openrouter_response_format(),
+                "max_tokens": MAX_OUTPUT_TOKENS,
+            },
+        })
     return config.get(api_service)
 
-def analyze_text_directly(text, api_service="gemini"):
-    """Langsung analisis teks tanpa perlu file."""
+def result_cache_key(text, api_service, api_config):
+    """Kunci cache: hash dari teks ternormalisasi, layanan, model, dan template prompt."""
+    return make_key(api_service, api_config.get("model"), api_config.get("prompt"), normalize_text(text))
+
+def get_result_cache():
+    return get_cache("results", ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ENTRIES)
+
+def invalidate_cached_result(text, api_service="gemini"):
+    """Hapus hasil analisis yang tersimpan di cache untuk teks & layanan ini."""
     api_config = get_api_config(api_service)
+    if not api_config:
+        return False
+    return get_result_cache().invalidate(result_cache_key(text, api_service, api_config))
+
+def near_duplicate_scope(api_service, api_config):
+    """Kelompok indeks teks hampir sama: hasil dari layanan, model atau prompt lain tidak dipakai ulang."""
+    return make_key(api_service, api_config.get("model"), api_config.get("prompt"))[:16]
+
+def find_near_duplicate(text, api_service, api_config):
+    """Cari hasil cache dari teks yang hampir sama dengan `text`.
+
+    Mengembalikan (hasil, signature). Hasil berupa salinan hasil asli dengan
+    key "_derived_from" (kunci cache asli dan perkiraan kemiripan), atau None
+    jika tidak ada; signature dipakai untuk mendaftarkan hasil baru (None jika
+    teks terlalu pendek atau fitur ini tidak berlaku).
+    """
+    if not NEAR_DUP_ENABLED or api_service not in NEAR_DUP_SERVICES:
+        return None, None
+    with stage("near_dup_lookup", provider=api_service) as lookup:
+        signature = near_duplicate.minhash(text)
+        match = None
+        if signature is not None:
+            index = near_duplicate.get_index(NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_ENTRIES)
+            match = index.lookup(signature, near_duplicate_scope(api_service, api_config))
+        original = get_result_cache().get(match["cache_key"]) if match else None
+        if match and not isinstance(original, dict):
+            # Hasil asli sudah kedaluwarsa / terbuang dari cache
+            index.remove(match["id"])
+            original = None
+        lookup.status = "hit" if original is not None else "miss"
+    if original is None:
+        return None, signature
+    logger.info(f"Hasil {api_service.upper()} diambil dari teks yang hampir sama (kemiripan {match['similarity']}).")
+    return {**original, "_derived_from": {"cache_key": match["cache_key"], "similarity": match["similarity"]}}, signature
+
+def local_fallback(text, api_service, error, fallback=None):
+    """Ganti hasil error dari API remote dengan hasil engine lokal (jika diaktifkan)."""
+    if not (LOCAL_FALLBACK if fallback is None else fallback):
+        return {"_error": error}
+    logger.info(f"Memakai engine lokal sebagai fallback untuk {api_service.upper()}.")
+    result = analyze_local(text)
+    result["_fallback_from"] = api_service
+    result["_fallback_reason"] = error
+    return result
+
+def build_chunked_result(api_service, spans, results):
+    """Susun hasil dokumen dari hasil per bagian: label gabungan + detail tiap bagian."""
+    chunks = []
+    for (start, end), result in zip(spans, results):
+        label, score = extract_sentiment_label(api_service, result)
+        chunks.append({"start": start, "end": end, "label": label, "score": score, "result": result})
+    label, score = merge_chunk_labels(chunks)
+    return {"_chunked": api_service, "label": label, "score": score, "chunks": chunks}
+
+def analyze_long_text(text, api_service="gemini", timeout=60, use_cache=True, fallback=None, verbose=None):
+    """Analisis teks panjang: potong per paragraf/kalimat sesuai anggaran token
+    provider, analisis tiap bagian secara paralel, lalu gabungkan labelnya
+    (berbobot panjang bagian). Posisi karakter tiap bagian disimpan di "chunks".
+    """
+    spans = split_into_chunks(text, chunk_token_budget(api_service))
+    logger.info(f"Teks panjang dipotong menjadi {len(spans)} bagian untuk {api_service.upper()}.")
+    with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_WORKERS, len(spans)))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, analyze_text_directly, text[start:end], api_service,
+                            timeout=timeout, use_cache=use_cache, fallback=fallback, chunking=False,
+                            verbose=verbose)
+            for start, end in spans
+        ]
+        results = [future.result() for future in futures]
+    return build_chunked_result(api_service, spans, results)
+
+def trim_input(text, max_tokens=None):
+    """Pangkas teks ke anggaran token input (default SENTIMENT_INPUT_TOKENS, 0 = tidak dipangkas)."""
+    max_tokens = INPUT_TOKEN_BUDGET if max_tokens is None else max_tokens
+    trimmed = trim_to_token_budget(text, max_tokens)
+    if len(trimmed) < len(text):
+        logger.info(f"Teks dipangkas dari ~{estimate_tokens(text)} menjadi ~{estimate_tokens(trimmed)} token.")
+    return trimmed
+
+def analyze_text_directly(text, api_service="gemini", timeout=60, use_cache=True, fallback=None, chunking=True,
+                          verbose=None):
+    """Langsung analisis teks tanpa perlu file.
+
+    `timeout` adalah batas waktu (detik) untuk satu request ke provider.
+    Hasil yang berhasil disimpan di cache lokal; set `use_cache=False`
+    (atau SENTIMENT_CACHE=0) untuk selalu memanggil API. Jika tidak ada di
+    cache, hasil teks yang hampir sama dipakai ulang (lihat find_near_duplicate).
+    `api_service="local"` memakai engine offline; jika API remote error atau
+    timeout, hasil engine lokal dipakai sebagai fallback (atur lewat `fallback`).
+    Teks dipangkas dulu ke SENTIMENT_INPUT_TOKENS (jika diatur); teks yang
+    masih melebihi anggaran token provider dianalisis per bagian
+    (lihat analyze_long_text) kecuali `chunking=False`.
+    Gemini dan DeepSeek menjawab JSON ringkas yang diurai menjadi dict
+    {label, score, highlights, "_structured"}; `verbose=True` meminta
+    penjelasan teks bebas seperti sebelumnya (lihat get_api_config).
+    """
+    if api_service == "local":
+        return analyze_local(text)
+
+    api_config = get_api_config(api_service, verbose=verbose)
     if not api_config or not api_config.get("key"):
         msg = f"Konfigurasi atau API Key untuk {api_service} tidak ditemukan. Melewati..."
-        print(msg)
+        logger.warning(msg)
+        # Konfigurasi yang hilang bukan kegagalan panggilan: jangan disamarkan dengan fallback lokal
         return {"_error": msg}
 
+    if chunking:
+        text = trim_input(text)
+    budget = chunk_token_budget(api_service)
+    if chunking and budget and estimate_tokens(text) > budget:
+        return analyze_long_text(text, api_service, timeout=timeout, use_cache=use_cache, fallback=fallback,
+                                 verbose=verbose)
+
+    use_cache = use_cache and cache_enabled()
+    if use_cache:
+        cache_key = result_cache_key(text, api_service, api_config)
+        cached = get_result_cache().get(cache_key)
+        if cached is not None:
+            logger.info(f"Hasil {api_service.upper()} diambil dari cache.")
+            return cached
+        derived, signature = find_near_duplicate(text, api_service, api_config)
+        if derived is not None:
+            return derived
+
+    health = routing.get_health(api_service)
+    if not health.allow():
+        msg = (f"Circuit breaker {api_service} terbuka setelah {health.consecutive_failures} kegagalan beruntun; "
+               f"request dilewati selama {health.cooldown:g} detik.")
+        logger.warning(msg)
+        return local_fallback(text, api_service, msg, fallback)
+
     payload = api_config["payload_template"](text)
     headers = api_config.get("headers", {})
     
+    # Kesehatan provider dicatat sekali per request, setelah tahu hasilnya bisa dipakai atau tidak
+    start = time.perf_counter()
+    latency = None
     try:
-        if api_service in ["deepseek", "bert"]:
-            # Timeout dinaikkan menjadi 60 detik
-            print(f"Menghubungi {api_service.upper()}... (mungkin butuh waktu jika model sedang 'tidur')")
-            response = requests.post(api_config["url"], headers=headers, json=payload, timeout=60)
-        else: # Gemini
-            print(f"Menghubungi {api_service.upper()}...")
-            response = requests.post(f"{api_config['url']}?key={api_config['key']}", json=payload, timeout=60)
+        with stage("provider_call", provider=api_service) as call:
+            if api_service in ["deepseek", "bert"]:
+                # Timeout default 60 detik
+                logger.info(f"Menghubungi {api_service.upper()}... (mungkin butuh waktu jika model sedang 'tidur')")
+                response = http_utils.post(api_config["url"], headers=headers, json=payload, timeout=timeout, provider=api_service)
+            else: # Gemini
+                logger.info(f"Menghubungi {api_service.upper()}...")
+                response = http_utils.post(f"{api_config['url']}?key={api_config['key']}", json=payload, timeout=timeout, provider=api_service)
+            if not response.ok:
+                call.status = "error"
+        latency = time.perf_counter() - start
 
         # If response is not OK, include status code and a truncated body to help debugging
         if not response.ok:
+            health.record(latency, False)
             body = response.text or ''
             snippet = (body[:1000] + '...') if len(body) > 1000 else body
             msg = f"Error saat menghubungi API {api_service}: {response.status_code} - {snippet}"
-            print(msg)
-            return {"_error": msg}
+            logger.warning(msg)
+            return local_fallback(text, api_service, msg, fallback)
 
         # OK
-        return response.json()
+        with stage("json_decode", provider=api_service):
+            result = response.json()
+            if api_config.get("structured"):
+                result = parse_response(api_service, result).to_dict()
+            elif api_service == "bert":
+                result = bert_single_shape(result)
+        health.record(latency, True)
+        if use_cache:
+            get_result_cache().set(cache_key, result)
+            if signature is not None:
+                near_duplicate.get_index(NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_ENTRIES).add(
+                    signature, near_duplicate_scope(api_service, api_config), cache_key)
+        return result
+    except StructuredOutputError as e:
+        health.record(latency, False)
+        msg = f"Jawaban {api_service} tidak sesuai format JSON ringkas: {e}"
+        logger.warning(msg)
+        return local_fallback(text, api_service, msg, fallback)
     except requests.exceptions.RequestException as e:
+        # Termasuk body 200 yang bukan JSON (requests.JSONDecodeError)
+        health.record(time.perf_counter() - start if latency is None else latency, False)
         msg = f"Error saat menghubungi API {api_service}: {e}"
-        print(msg)
-        return {"_error": msg}
+        logger.warning(msg)
+        return local_fallback(text, api_service, msg, fallback)
+
+def _stream_delta(api_service, event):
+    """Potongan teks baru dari satu event stream Gemini / OpenRouter."""
+    if api_service == "gemini":
+        candidates = event.get("candidates") or [{}]
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+    choices = event.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+def _assemble_stream_result(api_service, text):
+    """Susun teks hasil stream menjadi bentuk respons non-streaming provider tersebut."""
+    if api_service == "gemini":
+        return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+    return {"choices": [{"message": {"role": "assistant", "content": text}}]}
+
+def _final_event(api_service, result, start):
+    label, score = extract_sentiment_label(api_service, result)
+    return {
+        "type": "final",
+        "service": api_service,
+        "label": label,
+        "score": score,
+        "summary": format_service_result(api_service, result),
+        "result": result,
+        "time": round(time.perf_counter() - start, 3),
+    }
+
+def stream_analyze_text(text, api_service="gemini", timeout=60, use_cache=True, fallback=None):
+    """Analisis teks dengan jawaban bertahap (streaming); generator event berbentuk dict.
+
+    Event yang dihasilkan, berurutan:
+      {"type": "delta", "text": ...}   potongan jawaban begitu tiba (hanya Gemini / DeepSeek)
+      {"type": "label", "label": ...}  sekali, segera setelah label sentimen terbaca
+      {"type": "error", "error": ...}  jika request gagal (diikuti hasil fallback lokal)
+      {"type": "final", "label", "score", "summary", "result", "time"}
+
+    "result" pada event final berbentuk sama dengan hasil analyze_text_directly
+    (dan disimpan di cache yang sama), "summary" adalah hasil normalize_api_result.
+    Layanan tanpa streaming (BERT, lokal), hasil cache, dan teks yang perlu
+    dipotong langsung menghasilkan event label dan final. Streaming selalu
+    memakai prompt verbose karena tujuannya membaca penjelasan selagi ditulis.
+    """
+    start = time.perf_counter()
+    api_config = get_api_config(api_service, verbose=True)
+    text = trim_input(text)
+    budget = chunk_token_budget(api_service)
+    cached = None
+    if api_service in STREAMING_SERVICES and api_config and api_config.get("key"):
+        use_cache = use_cache and cache_enabled()
+        if use_cache:
+            cache_key = result_cache_key(text, api_service, api_config)
+            cached = get_result_cache().get(cache_key)
+    if (api_service not in STREAMING_SERVICES or not api_config or not api_config.get("key")
+            or (budget and estimate_tokens(text) > budget) or cached is not None):
+        result = cached if cached is not None else analyze_text_directly(text, api_service, timeout=timeout,
+                                                                         use_cache=use_cache, fallback=fallback,
+                                                                         verbose=True)
+        final = _final_event(api_service, result, start)
+        if final["label"]:
+            yield {"type": "label", "service": api_service, "label": final["label"], "time": final["time"]}
+        yield final
+        return
+
+    if api_service == "gemini":
+        url = f"{ENDPOINT_GEMINI_STREAM}?alt=sse&key={api_config['key']}"
+        payload, headers = api_config["payload_template"](text), {}
+    else:
+        url = api_config["url"]
+        payload, headers = {**api_config["payload_template"](text), "stream": True}, api_config.get("headers", {})
+
+    pieces, label, error = [], None, None
+    try:
+        with stage("provider_call", provider=api_service) as call:
+            logger.info(f"Menghubungi {api_service.upper()} (streaming)...")
+            response = http_utils.post(url, headers=headers, json=payload, timeout=timeout,
+                                       provider=api_service, stream=True)
+            try:
+                if not response.ok:
+                    body = response.text or ''
+                    snippet = (body[:1000] + '...') if len(body) > 1000 else body
+                    error = f"Error saat menghubungi API {api_service}: {response.status_code} - {snippet}"
+                else:
+                    for data in http_utils.iter_sse(response):
+                        if data == "[DONE]":
+                            break
+                        event = json.loads(data)
+                        if event.get("error"):
+                            error = f"Error saat menghubungi API {api_service}: {json.dumps(event['error'], ensure_ascii=False)}"
+                            break
+                        delta = _stream_delta(api_service, event)
+                        if not delta:
+                            continue
+                        pieces.append(delta)
+                        yield {"type": "delta", "service": api_service, "text": delta}
+                        if label is None:
+                            match = LABEL_AFTER_SENTIMENT_RE.search("".join(pieces))
+                            if match:
+                                label = LABEL_WORDS[match.group(1).lower()]
+                                elapsed = time.perf_counter() - start
+                                observe_stage("time_to_label", elapsed, provider=api_service)
+                                yield {"type": "label", "service": api_service, "label": label, "time": round(elapsed, 3)}
+                    if not error and not pieces:
+                        error = f"Respons streaming {api_service} kosong."
+            finally:
+                # Juga dijalankan jika pemanggil berhenti membaca stream lebih awal
+                response.close()
+            if error:
+                call.status = "error"
+    except (requests.exceptions.RequestException, ValueError) as e:
+        error = f"Error saat menghubungi API {api_service}: {e}"
+
+    if error:
+        logger.warning(error)
+        yield {"type": "error", "service": api_service, "error": error}
+        result = local_fallback(text, api_service, error, fallback)
+    else:
+        result = _assemble_stream_result(api_service, "".join(pieces))
+        if use_cache:
+            get_result_cache().set(cache_key, result)
+
+    final = _final_event(api_service, result, start)
+    if label is None and final["label"]:
+        yield {"type": "label", "service": api_service, "label": final["label"], "time": final["time"]}
+    yield final
+
+def read_html_text(file_path):
+    """Membaca file HTML dan mengembalikan teks polosnya."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        html_content = file.read()
+    return clean_html_text(html_content)
+
+def pack_batches(texts, batch_size=BERT_BATCH_SIZE, max_bytes=BERT_BATCH_MAX_BYTES):
+    """Kelompokkan indeks `texts` menjadi batch sesuai jumlah maksimum dan batas byte.
+
+    Teks yang sendirian sudah melebihi `max_bytes` tetap dikirim sebagai batch tunggal.
+    """
+    batches, current, current_bytes = [], [], 0
+    for i, text in enumerate(texts):
+        size = len(text.encode("utf-8"))
+        if current and (len(current) >= batch_size or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(i)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+# Status yang menandakan isi batch bermasalah (terlalu besar / input tidak valid); batch seperti ini
+# dibelah dua. Status lain (429, 503 model sedang dimuat, timeout) sudah dicoba ulang oleh http_utils.
+BERT_SPLIT_STATUSES = {400, 413, 422}
+
+def bert_single_shape(result):
+    """Samakan bentuk hasil BERT dengan respons HF untuk satu input: [[{label, score}, ...]]."""
+    if isinstance(result, list) and (not result or isinstance(result[0], dict)):
+        return [result]
+    return result
+
+def _post_bert_batch(texts, api_config, timeout):
+    """Kirim beberapa teks sekaligus ke HF.
+
+    Batch dibelah dua dan dicoba ulang hanya jika isinya yang bermasalah
+    (status 400/413/422 atau jumlah hasil tidak sesuai). Error sementara
+    membuat seluruh batch gagal sekaligus (lalu memakai fallback) agar model
+    yang sedang "tidur" tidak dibanjiri request pecahan.
+    Mengembalikan list hasil dengan urutan yang sama seperti `texts`.
+    """
+    error = None
+    split = False
+    try:
+        with stage("provider_call", provider="bert") as call:
+            response = http_utils.post(api_config["url"], headers=api_config.get("headers", {}),
+                                       json={"inputs": texts}, timeout=timeout, provider="bert")
+            if not response.ok:
+                call.status = "error"
+        if response.ok:
+            with stage("json_decode", provider="bert"):
+                result = response.json()
+            # Untuk input list, HF mengembalikan satu list {label, score} per input
+            if isinstance(result, list) and len(result) == len(texts):
+                return result
+            error = f"Jumlah hasil BERT ({len(result) if isinstance(result, list) else 'bukan list'}) tidak sesuai jumlah input ({len(texts)})"
+            split = True
+        else:
+            body = response.text or ''
+            snippet = (body[:1000] + '...') if len(body) > 1000 else body
+            error = f"Error saat menghubungi API bert: {response.status_code} - {snippet}"
+            split = response.status_code in BERT_SPLIT_STATUSES
+    except requests.exceptions.RequestException as e:
+        error = f"Error saat menghubungi API bert: {e}"
 
-def analyze_news_from_html(file_path, api_service="gemini"):
+    if len(texts) == 1 or not split:
+        logger.warning(error)
+        return [{"_error": error} for _ in texts]
+    middle = len(texts) // 2
+    logger.info(f"Batch BERT ({len(texts)} teks) gagal, dibelah dua dan dicoba ulang...")
+    return _post_bert_batch(texts[:middle], api_config, timeout) + _post_bert_batch(texts[middle:], api_config, timeout)
+
+def analyze_texts_bert_batch(texts, batch_size=BERT_BATCH_SIZE, max_bytes=BERT_BATCH_MAX_BYTES, timeout=60, use_cache=True, fallback=None, chunking=True):
+    """Analisis banyak teks dengan BERT memakai sesedikit mungkin request.
+
+    Teks dikemas ke dalam batch (maksimal `batch_size` teks dan `max_bytes`
+    byte per request). Hasil dikembalikan dalam urutan yang sama dengan
+    `texts`, masing-masing berbentuk sama seperti hasil analyze_text_directly
+    ([[{label, score}, ...]], termasuk fallback ke engine lokal untuk item
+    yang gagal). Teks yang
+    melebihi batas token BERT dipotong dulu dan bagian-bagiannya ikut dikirim
+    dalam batch yang sama.
+    """
+    api_config = get_api_config("bert")
+    if not api_config or not api_config.get("key"):
+        msg = "Konfigurasi atau API Key untuk bert tidak ditemukan. Melewati..."
+        logger.warning(msg)
+        return [{"_error": msg} for _ in texts]
+
+    if chunking:
+        texts = [trim_input(t) for t in texts]
+    budget = chunk_token_budget("bert")
+    if chunking and budget and any(estimate_tokens(t) > budget for t in texts):
+        spans = [split_into_chunks(t, budget) if estimate_tokens(t) > budget else [(0, len(t))] for t in texts]
+        flat_results = analyze_texts_bert_batch(
+            [t[start:end] for t, text_spans in zip(texts, spans) for start, end in text_spans],
+            batch_size=batch_size, max_bytes=max_bytes, timeout=timeout,
+            use_cache=use_cache, fallback=fallback, chunking=False,
+        )
+        results, pos = [], 0
+        for text_spans in spans:
+            part = flat_results[pos:pos + len(text_spans)]
+            pos += len(text_spans)
+            results.append(part[0] if len(text_spans) == 1 else build_chunked_result("bert", text_spans, part))
+        return results
+
+    results = [None] * len(texts)
+    use_cache = use_cache and cache_enabled()
+    keys = [result_cache_key(text, "bert", api_config) for text in texts] if use_cache else None
+    if use_cache:
+        cache = get_result_cache()
+        for i, key in enumerate(keys):
+            results[i] = bert_single_shape(cache.get(key))
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    missing_texts = [texts[i] for i in missing]
+    batches = pack_batches(missing_texts, batch_size=batch_size, max_bytes=max_bytes)
+    if batches:
+        logger.info(f"Menghubungi BERT: {len(missing)} teks dalam {len(batches)} request batch...")
+    for batch in batches:
+        batch_results = _post_bert_batch([missing_texts[j] for j in batch], api_config, timeout)
+        for j, result in zip(batch, batch_results):
+            i = missing[j]
+            if isinstance(result, dict) and result.get("_error"):
+                results[i] = local_fallback(texts[i], "bert", result["_error"], fallback)
+                continue
+            results[i] = result = bert_single_shape(result)
+            if use_cache:
+                cache.set(keys[i], result)
+    return results
+
+def analyze_news_from_html(file_path, api_service="gemini", timeout=60):
     """Membaca file HTML dan analisis teksnya."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            html_content = file.read()
-        plain_text = clean_html_text(html_content)
+        plain_text = read_html_text(file_path)
         if not plain_text:
-            print("Error: Tidak ditemukan teks dalam file HTML.")
+            logger.warning("Error: Tidak ditemukan teks dalam file HTML.")
             return None
-        return analyze_text_directly(plain_text, api_service)
+        return analyze_text_directly(plain_text, api_service, timeout=timeout)
     except FileNotFoundError:
         msg = f"Error: File '{file_path}' tidak ditemukan."
-        print(msg)
+        logger.warning(msg)
         return {"_error": msg}
 
-def analyze_input(file_path, api_service):
-    """Menganalisis input berdasarkan tipe file untuk satu layanan API."""
-    # Resolve the input path: support absolute paths, CWD relative paths,
-    # and paths relative to this script's directory.
-    def resolve_file_path(p):
-        # If already absolute and exists, return it
-        if os.path.isabs(p) and os.path.exists(p):
-            return p
-
-        # Check relative to script directory
-        script_dir = os.path.dirname(__file__)
-        candidate = os.path.join(script_dir, p)
-        if os.path.exists(candidate):
-            return candidate
-
-        # Check as given relative to current working directory
-        abs_candidate = os.path.abspath(p)
-        if os.path.exists(abs_candidate):
-            return abs_candidate
-
-        # Not found; return original so callers/handlers can handle FileNotFound
+def resolve_file_path(p):
+    """Resolve the input path: support absolute paths, CWD relative paths,
+    and paths relative to this script's directory."""
+    # If already absolute and exists, return it
+    if os.path.isabs(p) and os.path.exists(p):
         return p
 
-    resolved = resolve_file_path(file_path)
+    # Check relative to script directory
+    candidate = os.path.join(script_dir, p)
+    if os.path.exists(candidate):
+        return candidate
+
+    # Check as given relative to current working directory
+    abs_candidate = os.path.abspath(p)
+    if os.path.exists(abs_candidate):
+        return abs_candidate
+
+    # Not found; return original so callers/handlers can handle FileNotFound
+    return p
+
+def extract_input(file_path):
+    """Tahap ekstraksi: ubah file input (html, gambar, txt) menjadi teks polos.
+
+    Mengembalikan string teks jika berhasil, None jika file tidak ditemukan
+    atau kosong, atau dict {"_error": ...} jika ekstraksi gagal.
+    """
+    with stage("resolve_file") as resolving:
+        resolved = resolve_file_path(file_path)
+        if not os.path.exists(resolved):
+            resolving.status = "error"
     ext = os.path.splitext(resolved)[-1].lower()
 
     # If the resolved path does not exist, show helpful debug info and stop early
     if not os.path.exists(resolved):
-        print(f"Error: File '{file_path}' tidak ditemukan.")
-        print("Paths diperiksa:")
-        print(f" - as given: {os.path.abspath(file_path)}")
-        print(f" - relative to script: {os.path.join(os.path.dirname(__file__), file_path)}")
-        print(f"Current working directory: {os.getcwd()}")
+        logger.warning(f"Error: File '{file_path}' tidak ditemukan.")
+        logger.warning("Paths diperiksa:")
+        logger.warning(f" - as given: {os.path.abspath(file_path)}")
+        logger.warning(f" - relative to script: {os.path.join(script_dir, file_path)}")
+        logger.warning(f"Current working directory: {os.getcwd()}")
         return None
 
     if ext in [".html", ".htm"]:
-        return analyze_news_from_html(resolved, api_service)
+        plain_text = read_html_text(resolved)
+        if not plain_text:
+            logger.warning("Error: Tidak ditemukan teks dalam file HTML.")
+            return None
+        return plain_text
     elif ext in [".jpg", ".jpeg", ".png"]:
-        print(f"Menjalankan OCR pada {resolved}...")
+        logger.info(f"Menjalankan OCR pada {resolved}...")
         extracted_text = extract_text_from_image(resolved)
         if not extracted_text:
             msg = "Gagal mengekstrak teks dari gambar."
-            print(msg)
+            logger.warning(msg)
             return {"_error": msg}
-        print("Teks hasil OCR berhasil diekstrak. Mengirim ke API analisis...")
-        return analyze_text_directly(extracted_text, api_service)
+        logger.info("Teks hasil OCR berhasil diekstrak.")
+        return extracted_text
     elif ext == ".txt":
         with open(resolved, "r", encoding="utf-8") as f:
-            text = f.read()
-        return analyze_text_directly(text, api_service)
+            return f.read()
     else:
-        print(f"Format file '{ext}' tidak didukung.")
         msg = f"Format file '{ext}' tidak didukung."
+        logger.warning(msg)
         return {"_error": msg}
 
+def analyze_input(file_path, api_service, timeout=60):
+    """Menganalisis input berdasarkan tipe file untuk satu layanan API."""
+    extracted = extract_input(file_path)
+    if not isinstance(extracted, str):
+        return extracted
+    logger.info("Mengirim teks ke API analisis...")
+    return analyze_text_directly(extracted, api_service, timeout=timeout)
+
+def format_service_result(service, result):
+    """Ubah hasil mentah satu layanan menjadi string yang siap ditampilkan."""
+    if not result:
+        return "Gagal mendapatkan hasil."
+    if isinstance(result, dict) and result.get("_error"):
+        return f"ERROR: {result.get('_error')}"
+    # try to normalize into readable text
+    with stage("normalize", provider=service):
+        normalized = normalize_api_result(service, result)
+    if normalized and isinstance(result, dict) and result.get("_derived_from"):
+        normalized = f"[dari teks yang hampir sama, kemiripan {result['_derived_from']['similarity']:.2f}] {normalized}"
+    return normalized if normalized else (json.dumps(result, indent=2, ensure_ascii=False))
+
+def _timed_analyze(text, service, timeout, verbose=None):
+    """Jalankan analyze_text_directly dan kembalikan (hasil, durasi dalam detik).
+
+    Exception ditangkap di sini agar durasi yang dilaporkan tetap durasi sebenarnya.
+    """
+    start = time.perf_counter()
+    try:
+        result = analyze_text_directly(text, api_service=service, timeout=timeout, verbose=verbose)
+    except Exception as e:
+        logger.error(f"Analisis {service} gagal: {e}")
+        result = {"_error": str(e)}
+    return result, time.perf_counter() - start
+
+def _submit_daemon(fn, *args, **kwargs):
+    """Jalankan fn di thread daemon (dengan context saat ini) dan kembalikan Future-nya.
+
+    Thread ThreadPoolExecutor tetap ditunggu saat interpreter keluar; thread daemon
+    tidak, sehingga request hedge yang kalah atau provider yang melewati batas waktu
+    compare tidak menahan CLI sampai timeout-nya habis.
+    """
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(context.run(fn, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def analyze_routed(text, services=None, timeout=60, hedge=True, fallback=None, verbose=None):
+    """Analisis dengan satu provider terbaik, bukan semuanya (mode routing).
+
+    Provider diurutkan menurut latensi & error rate yang teramati; provider
+    dengan circuit breaker terbuka dilewati (lihat routing.py). Jika provider
+    pertama belum menjawab setelah p95 latensinya, request duplikat (hedge)
+    dikirim ke provider berikutnya dan jawaban yang lebih dulu berhasil
+    dipakai. Provider yang gagal langsung diganti provider berikutnya; jika
+    semuanya gagal, engine lokal dipakai sebagai fallback (atur lewat `fallback`).
+
+    Mengembalikan dict {"service", "result", "hedged", "tried", "errors", "time"};
+    `result` berbentuk sama seperti hasil analyze_text_directly untuk `service`.
+    """
+    start = time.perf_counter()
+    queue = routing.rank_providers(list(services or ROUTE_SERVICES), timeout=timeout)
+    tried, errors, pending = [], {}, {}
+    hedged = False
+
+    def launch():
+        service = queue.pop(0)
+        tried.append(service)
+        # Request yang kalah tidak ditunggu; hasilnya tetap masuk cache & statistik routing
+        future = _submit_daemon(analyze_text_directly, text, service, timeout=timeout, fallback=False,
+                                verbose=verbose)
+        pending[future] = service
+
+    def routed(service, result):
+        return {"service": service, "result": result, "hedged": hedged, "tried": tried, "errors": errors,
+                "time": round(time.perf_counter() - start, 3)}
+
+    if queue:
+        launch()
+    while pending:
+        delay = None
+        if hedge and queue and len(pending) == 1:
+            delay = routing.get_health(next(iter(pending.values()))).hedge_delay()
+        done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+        if not done:
+            hedged = True
+            logger.info(f"{tried[-1].upper()} belum menjawab setelah {delay:.2f} detik; "
+                        f"mengirim duplikat ke {queue[0].upper()}.")
+            routing.HEDGED_REQUESTS.inc(provider=tried[-1])
+            launch()
+            continue
+        for future in done:
+            service = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"_error": str(e)}
+            if isinstance(result, dict) and result.get("_error"):
+                errors[service] = result["_error"]
+                continue
+            logger.info(f"Jawaban dipakai dari {service.upper()} ({len(tried)} provider dicoba).")
+            return routed(service, result)
+        if not pending and queue:
+            launch()
+
+    if errors:
+        msg = "Semua provider gagal: " + "; ".join(f"{s}: {e}" for s, e in errors.items())
+    else:
+        msg = "Tidak ada provider untuk routing."
+    logger.warning(msg)
+    result = local_fallback(text, tried[0] if tried else "routing", msg, fallback)
+    return routed("local" if not result.get("_error") else None, result)
+
 # --- FUNGSI BARU UNTUK MEMBANDINGKAN ---
-def compare_all_services(file_path):
+def compare_all_services(file_path, concurrent=False, provider_timeout=60, deadline=None, services=None, text=None,
+                         verbose=None, routed=False):
     """
     Memanggil semua layanan API (Gemini, DeepSeek, BERT) untuk menganalisis 
-    satu file input dan mengembalikan semua hasilnya.
+    satu file input dan mengembalikan semua hasilnya. Daftar layanan bisa
+    diganti lewat `services` (misalnya menambahkan "local").
+
+    Jika `concurrent` True, ketiga layanan dipanggil bersamaan sehingga total
+    waktu mengikuti layanan paling lambat, bukan jumlah semuanya.
+    `provider_timeout` membatasi waktu tiap layanan dan `deadline` membatasi
+    waktu keseluruhan perbandingan (hanya berlaku pada mode concurrent).
+
+    Teks diekstrak satu kali (OCR / parsing HTML / baca .txt) lalu dibagikan
+    ke semua layanan. Teks hasil ekstraksi dilaporkan di key "_extracted_text",
+    dan waktu ekstraksi serta waktu per layanan (detik) di key "_timings".
+    Jika `text` diisi, ekstraksi dilewati dan `file_path` hanya dipakai untuk log.
+    `verbose=True` meminta penjelasan lengkap dari Gemini/DeepSeek (lihat get_api_config).
+
+    `routed=True` hanya meminta satu jawaban lewat analyze_routed (provider
+    tercepat yang sehat, dengan hedge); hasilnya ada di key layanan yang
+    menjawab dan detail routing di key "_route".
     """
-    services = ["gemini", "deepseek", "bert"]
+    route_services = services or ROUTE_SERVICES
+    services = list(services or DEFAULT_SERVICES)
     all_results = {}
+    timings = {}
 
-    print(f"Memulai analisis komparatif untuk file: '{file_path}'")
-    
+    logger.info(f"Memulai analisis komparatif untuk file: '{file_path}'")
+
+    start = time.perf_counter()
+    if text is None:
+        text = extract_input(file_path)
+    timings["extraction"] = round(time.perf_counter() - start, 3)
+    if not isinstance(text, str):
+        # Ekstraksi gagal: semua layanan mendapat pesan yang sama
+        for service in services:
+            all_results[service] = format_service_result(service, text)
+        all_results["_extracted_text"] = None
+        all_results["_timings"] = timings
+        return all_results
+
+    if routed:
+        route = analyze_routed(text, services=route_services, timeout=provider_timeout, verbose=verbose)
+        service = route["service"] or "routing"
+        all_results[service] = format_service_result(service, route["result"])
+        timings[service] = route["time"]
+        all_results["_route"] = {key: route[key] for key in ("service", "hedged", "tried", "errors")}
+    elif concurrent:
+        logger.info(f"🚀 Memproses {', '.join(s.upper() for s in services)} secara bersamaan")
+        limit = provider_timeout if deadline is None else min(provider_timeout, deadline)
+        # Thread daemon membawa context (request ID) dan tidak menahan proses setelah batas waktu
+        futures = {
+            _submit_daemon(_timed_analyze, text, service, provider_timeout, verbose): service
+            for service in services
+        }
+        done, _ = wait(futures, timeout=limit)
+        for future, service in futures.items():
+            if future in done:
+                result, elapsed = future.result()
+                all_results[service] = format_service_result(service, result)
+                timings[service] = round(elapsed, 3)
+            else:
+                if deadline is not None and deadline < provider_timeout:
+                    reason = f"melebihi batas waktu keseluruhan ({deadline} detik)"
+                else:
+                    reason = f"melebihi batas waktu layanan ({provider_timeout} detik)"
+                all_results[service] = format_service_result(
+                    service, local_fallback(text, service, f"{service} {reason}."))
+                timings[service] = round(limit, 3)
+    else:
+        for service in services:
+            logger.info("-" * 20)
+            logger.info(f"🚀 Memproses dengan layanan: {service.upper()}")
+            result, elapsed = _timed_analyze(text, service, provider_timeout, verbose)
+            all_results[service] = format_service_result(service, result)
+            timings[service] = round(elapsed, 3)
+
+    all_results["_extracted_text"] = text
+    all_results["_timings"] = timings
+    logger.info("-" * 20)
+    logger.info("Analisis komparatif selesai.")
+    return all_results
+
+def analyze_batch_chunk(items, services, timeout=60, bert_batch_size=BERT_BATCH_SIZE):
+    """Analisis sekelompok item batch (file atau baris CSV) dengan setiap layanan.
+
+    BERT dipanggil lewat jalur batch (beberapa teks per request), layanan
+    lain per item. Mengembalikan satu record datar per item: id, kolom
+    tambahan, hasil per layanan dan waktu per layanan (`<layanan>_time`).
+    Setiap item mendapat request ID sendiri untuk log & tahap per itemnya;
+    panggilan batch (BERT, lokal) tercatat dengan request ID kelompoknya.
+    Item yang layanannya gagal atau memakai fallback lokal mendapat "_error"
+    (gabungan pesan per layanan) sehingga dicoba lagi saat batch dilanjutkan.
+    """
+    with request_context():
+        return _analyze_batch_chunk(items, services, timeout, bert_batch_size)
+
+def _service_error(service, result):
+    """Pesan error satu layanan untuk kolom "_error", atau None jika hasilnya jawaban asli provider."""
+    if not result:
+        return f"{service}: tidak ada hasil"
+    if isinstance(result, dict):
+        if result.get("_error"):
+            return f"{service}: {result['_error']}"
+        if result.get("_fallback_from"):
+            return f"{service}: fallback lokal ({result.get('_fallback_reason')})"
+    return None
+
+def _analyze_batch_chunk(items, services, timeout, bert_batch_size):
+    records, texts = [], []
+    request_ids = [new_request_id() for _ in items]
+    for item, request_id in zip(items, request_ids):
+        records.append({k: v for k, v in item.items() if k not in ("text", "file")})
+        with request_context(request_id):
+            if "file" in item:
+                texts.append(extract_input(item["file"]))
+            else:
+                texts.append(item.get("text") or None)
+    valid = [i for i, text in enumerate(texts) if isinstance(text, str)]
+    errors = [[] if isinstance(text, str) else ["Teks tidak bisa diekstrak dari input."] for text in texts]
+
+    def record_result(i, service, result, elapsed):
+        records[i][service] = format_service_result(service, result)
+        records[i][f"{service}_time"] = elapsed
+        error = _service_error(service, result)
+        if error:
+            errors[i].append(error)
+
+    for service in services:
+        for i, text in enumerate(texts):
+            if not isinstance(text, str):
+                records[i][service] = format_service_result(service, text)
+                records[i][f"{service}_time"] = 0.0
+
+        if service == "local":
+            start = time.perf_counter()
+            results = analyze_local_many([texts[i] for i in valid])
+            per_item = (time.perf_counter() - start) / max(1, len(valid))
+            for i, result in zip(valid, results):
+                record_result(i, service, result, round(per_item, 6))
+            continue
+
+        if service == "bert":
+            start = time.perf_counter()
+            results = analyze_texts_bert_batch([texts[i] for i in valid], batch_size=bert_batch_size, timeout=timeout)
+            # Waktu batch dibagi rata ke setiap item di dalamnya
+            per_item = (time.perf_counter() - start) / max(1, len(valid))
+            for i, result in zip(valid, results):
+                record_result(i, service, result, round(per_item, 3))
+            continue
+
+        for i in valid:
+            with request_context(request_ids[i]):
+                result, elapsed = _timed_analyze(texts[i], service, timeout)
+            record_result(i, service, result, round(elapsed, 3))
+
+    for record, item_errors in zip(records, errors):
+        if item_errors:
+            record["_error"] = "; ".join(item_errors)
+    return records
+
+def run_batch_analysis(input_path, output_path, services=DEFAULT_SERVICES,
+                       text_column="text", id_column=None, keep_columns=(), workers=4, timeout=60,
+                       bert_batch_size=BERT_BATCH_SIZE):
+    """Analisis satu folder atau file CSV secara batch.
+
+    Hasil ditulis bertahap ke `output_path` (.jsonl atau .csv). Jika file
+    output sudah ada, item yang sudah tercatat dilewati sehingga proses
+    yang terhenti bisa dilanjutkan. Jika BERT atau engine lokal termasuk
+    layanan, item diproses per kelompok `bert_batch_size` agar keduanya
+    dipanggil secara batch.
+    """
+    done_ids = load_done_ids(output_path)
+    if done_ids:
+        logger.info(f"Melanjutkan batch: {len(done_ids)} item sudah ada di {output_path}")
+
+    items = iter_batch_items(input_path, text_column=text_column, id_column=id_column, keep_columns=keep_columns)
+    fieldnames = ["id", *keep_columns, *services, *(f"{s}_time" for s in services), "_error"]
+    with ResultWriter(output_path, fieldnames=fieldnames) as writer:
+        counts = run_batch(
+            items,
+            lambda chunk: analyze_batch_chunk(chunk, services, timeout=timeout, bert_batch_size=bert_batch_size),
+            writer,
+            workers=workers,
+            done_ids=done_ids,
+            chunk_size=bert_batch_size if ("bert" in services or "local" in services) else 1,
+        )
+    logger.info(f"Batch selesai: {counts['processed']} diproses, {counts['skipped']} dilewati, {counts['failed']} gagal.")
+    return counts
+
+def stream_to_console(file_path, services, timeout=60, worker_url=None):
+    """Mode --stream: tampilkan jawaban tiap layanan begitu tiba, dan label segera setelah terbaca.
+
+    Jika `worker_url` diisi, streaming diambil dari worker analysis_server.py.
+    Mengembalikan ringkasan per layanan seperti compare_all_services.
+    """
+    text = None
+    if not worker_url:
+        text = extract_input(file_path)
+        if not isinstance(text, str):
+            return {service: format_service_result(service, text) for service in services}
+
+    results, timings = {}, {}
     for service in services:
-        print("-" * 20)
-        print(f"🚀 Memproses dengan layanan: {service.upper()}")
-        result = analyze_input(file_path, api_service=service)
-        if not result:
-            all_results[service] = "Gagal mendapatkan hasil."
-        elif isinstance(result, dict) and result.get("_error"):
-            all_results[service] = f"ERROR: {result.get('_error')}"
+        print(f"\n--- {service.upper()} ---", flush=True)
+        if worker_url:
+            events = worker_client.stream_analyze(resolve_file_path(file_path), service=service,
+                                                  timeout=timeout, worker_url=worker_url)
         else:
-            # try to normalize into readable text
-            normalized = normalize_api_result(service, result)
-            all_results[service] = normalized if normalized else (json.dumps(result, indent=2, ensure_ascii=False))
-    
-    print("-" * 20)
-    print("Analisis komparatif selesai.")
-    return all_results
+            events = stream_analyze_text(text, service, timeout=timeout)
+        for event in events:
+            if event["type"] == "delta":
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "label":
+                print(f"\n>>> Sentimen {service.upper()}: {event['label'].upper()} (setelah {event['time']} detik)\n", flush=True)
+            elif event["type"] == "final":
+                results[service] = event["summary"]
+                timings[service] = event["time"]
+    results["_timings"] = timings
+    return results
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analisis sentimen: file input (html, txt, atau gambar).")
     parser.add_argument("file", nargs="?", default="berita.png", help="Path ke file (default: berita.png)")
+    parser.add_argument("--concurrent", action="store_true", help="Panggil semua layanan secara bersamaan")
+    parser.add_argument("--timeout", type=float, default=60, help="Batas waktu per layanan dalam detik (default: 60)")
+    parser.add_argument("--deadline", type=float, default=None, help="Batas waktu keseluruhan perbandingan dalam detik (mode --concurrent)")
+    parser.add_argument("--no-cache", action="store_true", help="Jangan gunakan cache hasil analisis")
+    parser.add_argument("--batch", action="store_true", help="Mode batch: input berupa folder atau file CSV")
+    parser.add_argument("--output", help="File hasil batch (.jsonl atau .csv, default: <input>_results.jsonl)")
+    parser.add_argument("--services", default=None, help=f"Layanan yang dipakai, dipisah koma (default: {','.join(DEFAULT_SERVICES)}; mode --routed: ROUTE_SERVICES; pilihan: {', '.join(AVAILABLE_SERVICES)})")
+    parser.add_argument("--text-column", default="text", help="Kolom teks pada input CSV (default: text)")
+    parser.add_argument("--id-column", default=None, help="Kolom id unik pada input CSV (default: nomor baris)")
+    parser.add_argument("--keep-columns", default="", help="Kolom CSV yang ikut disalin ke hasil, dipisah koma")
+    parser.add_argument("--workers", type=int, default=4, help="Jumlah item yang diproses bersamaan (default: 4)")
+    parser.add_argument("--bert-batch-size", type=int, default=BERT_BATCH_SIZE, help=f"Jumlah teks per request BERT pada mode batch (default: {BERT_BATCH_SIZE})")
+    parser.add_argument("--log-level", default=None, help="Level log: DEBUG, INFO, WARNING, ERROR (default: SENTIMENT_LOG_LEVEL, INFO; WARNING pada mode batch)")
+    parser.add_argument("--log-json", action="store_true", help="Tulis log sebagai baris JSON (dengan request_id)")
+    parser.add_argument("--metrics", help="Simpan metrik per tahap (format Prometheus) ke file ini setelah selesai")
+    parser.add_argument("--verbose", action="store_true", help="Minta alasan lengkap (teks bebas) dari Gemini/DeepSeek; default jawaban JSON ringkas")
+    parser.add_argument("--input-tokens", type=int, default=None, help="Pangkas teks input ke sekian token sebelum dikirim (default: SENTIMENT_INPUT_TOKENS, 0 = tidak dipangkas)")
+    parser.add_argument("--routed", action="store_true", help="Satu jawaban dari provider tercepat yang sehat (dengan hedge & circuit breaker), bukan semua layanan")
+    parser.add_argument("--stream", action="store_true", help="Tampilkan jawaban Gemini/DeepSeek secara bertahap dan label segera setelah muncul")
+    parser.add_argument("--worker", nargs="?", const=worker_client.DEFAULT_WORKER_URL, default=None,
+                        help=f"Kirim ke worker analysis_server.py yang sudah berjalan (default URL: ML_WORKER_URL atau {worker_client.DEFAULT_WORKER_URL})")
     args = parser.parse_args()
 
+    log_level = args.log_level or os.getenv("SENTIMENT_LOG_LEVEL") or ("WARNING" if args.batch else "INFO")
+    configure_logging(level=log_level, json_logs=True if args.log_json else None)
+    log_key_status()
+
+    if args.no_cache:
+        os.environ["SENTIMENT_CACHE"] = "0"
+    if args.verbose:
+        VERBOSE_OUTPUT = True
+    if args.input_tokens is not None:
+        INPUT_TOKEN_BUDGET = args.input_tokens
+
+    requested_services = [s.strip() for s in args.services.split(",") if s.strip()] if args.services else None
+    services = requested_services or list(DEFAULT_SERVICES)
+
+    if args.batch:
+        batch_input = resolve_file_path(args.file)
+        output = args.output or f"{os.path.splitext(batch_input.rstrip('/' + os.sep))[0]}_results.jsonl"
+        run_batch_analysis(
+            batch_input,
+            output,
+            services=services,
+            text_column=args.text_column,
+            id_column=args.id_column,
+            keep_columns=[c.strip() for c in args.keep_columns.split(",") if c.strip()],
+            workers=args.workers,
+            timeout=args.timeout,
+            bert_batch_size=args.bert_batch_size,
+        )
+        if args.metrics:
+            write_prometheus(args.metrics)
+        sys.exit(0)
+
     file_input = args.file
 
+    hasil_komparasi = None
+    if args.stream:
+        try:
+            with request_context():
+                hasil_komparasi = stream_to_console(file_input, services, timeout=args.timeout, worker_url=args.worker)
+        except worker_client.WorkerError as e:
+            logger.warning(f"{e} - analisis dijalankan langsung di proses ini.")
+            with request_context():
+                hasil_komparasi = stream_to_console(file_input, services, timeout=args.timeout)
+    elif args.worker:
+        try:
+            hasil_komparasi = worker_client.compare(
+                resolve_file_path(file_input),
+                services=requested_services,
+                concurrent=args.concurrent,
+                timeout=args.timeout,
+                deadline=args.deadline,
+                verbose=args.verbose,
+                routed=args.routed,
+                worker_url=args.worker,
+            )
+        except worker_client.WorkerError as e:
+            logger.warning(f"{e} - analisis dijalankan langsung di proses ini.")
+
     # Memanggil fungsi pembanding baru
-    hasil_komparasi = compare_all_services(file_input)
+    if hasil_komparasi is None:
+        with request_context():
+            hasil_komparasi = compare_all_services(
+                file_input,
+                concurrent=args.concurrent,
+                provider_timeout=args.timeout,
+                deadline=args.deadline,
+                services=requested_services,
+                routed=args.routed,
+            )
+    if args.metrics:
+        write_prometheus(args.metrics)
 
     # Mencetak hasil gabungan dengan format yang rapi
     if hasil_komparasi:
@@ -0,0 +1,401 @@
+"""Worker analisis yang terus berjalan: modul, session HTTP, cache dan engine lokal tetap "hangat".
+
+Endpoint (JSON):
+    POST /analyze      {"text": "..."} atau {"file": "path"}, "service": "gemini", "timeout": 60, "verbose": false
+                       "routed": true -> satu jawaban dari provider tercepat yang sehat (abaikan "service")
+                       "stream": true -> Server-Sent Events: delta, label, error, final
+    POST /compare      {"text"/"file", "services": [...], "concurrent": true, "timeout": 60, "deadline": null,
+                        "verbose": false, "routed": false}
+    POST /analyze_url  {"url": "https://...", "service": "gemini"}  (hanya http/https ke alamat publik)
+    GET  /health       status worker, antrian & circuit breaker tiap provider
+    GET  /metrics      metrik format Prometheus (lihat metrics.py)
+
+Contoh:
+    python analysis_server.py --port 8765 --workers 8 --queue-size 32
+"""
+import argparse
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import PBKK_link_api
+import PBKK_script_api
+import routing
+from local_sentiment import get_engine
+from metrics import REGISTRY, configure_logging, render_prometheus, request_context, stage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = os.getenv("ML_WORKER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("ML_WORKER_PORT", 8765))
+DEFAULT_WORKERS = int(os.getenv("ML_WORKER_THREADS", 8))
+DEFAULT_QUEUE_SIZE = int(os.getenv("ML_WORKER_QUEUE_SIZE", 32))
+# Batas ukuran body request (byte)
+MAX_BODY_BYTES = int(os.getenv("ML_WORKER_MAX_BODY", 10 * 1024 * 1024))
+# Payload {"file": ...} hanya boleh menunjuk file di bawah folder ini (default: folder ml/)
+FILE_ROOT = os.path.realpath(os.getenv("ML_WORKER_FILE_ROOT", os.path.dirname(os.path.abspath(__file__))))
+# /analyze_url menolak host loopback/privat kecuali diizinkan (misalnya untuk server stub lokal)
+ALLOW_PRIVATE_URLS = os.getenv("ML_WORKER_ALLOW_PRIVATE_URLS", "0").lower() in ("1", "true", "yes", "on")
+
+WORKER_REQUESTS = REGISTRY.counter("sentiment_worker_requests_total", "Jumlah request ke worker per endpoint dan status HTTP")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class RequestQueue:
+    """Antrian request terbatas.
+
+    Paling banyak `workers` request diproses bersamaan dan `max_queue`
+    request menunggu giliran; request berikutnya langsung ditolak
+    (QueueFull) agar worker tidak menumpuk pekerjaan tanpa batas.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @contextmanager
+    def admit(self):
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise QueueFull()
+            self.pending += 1
+        try:
+            with self._slots:
+                with self._lock:
+                    self.active += 1
+                try:
+                    yield
+                finally:
+                    with self._lock:
+                        self.active -= 1
+                        self.completed += 1
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "waiting": self.pending - self.active,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def render_prometheus(self):
+        stats = self.stats()
+        lines = []
+        for name in ("active", "waiting"):
+            lines.append(f"# TYPE sentiment_worker_queue_{name} gauge")
+            lines.append(f"sentiment_worker_queue_{name} {stats[name]}")
+        return "\n".join(lines) + "\n"
+
+
+# ============================
+# Handler endpoint
+# ============================
+def _allowed_file(path):
+    """Path asli `path` jika berada di bawah FILE_ROOT (symlink ikut diperiksa); selain itu ValueError."""
+    real = os.path.realpath(PBKK_script_api.resolve_file_path(path))
+    if os.path.commonpath([real, FILE_ROOT]) != FILE_ROOT:
+        raise ValueError(f"File harus berada di bawah {FILE_ROOT} (atur lewat ML_WORKER_FILE_ROOT).")
+    return real
+
+
+def check_public_url(url):
+    """Tolak URL selain http/https dan host yang mengarah ke alamat loopback, privat atau internal."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("URL harus berupa http:// atau https:// dengan nama host.")
+    if ALLOW_PRIVATE_URLS:
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80),
+                                   type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"Host {parts.hostname} tidak ditemukan: {e}") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"Host {parts.hostname} mengarah ke alamat internal ({address}); ditolak.")
+
+
+def _input_text(payload):
+    """Teks dari payload: langsung dari "text" atau hasil ekstraksi "file" (path di bawah FILE_ROOT)."""
+    if payload.get("text"):
+        return payload["text"]
+    if payload.get("file"):
+        return PBKK_script_api.extract_input(_allowed_file(payload["file"]))
+    raise ValueError('Payload harus berisi "text" atau "file".')
+
+
+def _service_response(service, result, elapsed):
+    label, score = PBKK_script_api.extract_sentiment_label(service, result)
+    return {
+        "service": service,
+        "label": label,
+        "score": score,
+        "summary": PBKK_script_api.format_service_result(service, result),
+        "result": result,
+        "time": round(elapsed, 3),
+    }
+
+
+def handle_routed(payload):
+    text = _input_text(payload)
+    if not isinstance(text, str):
+        return _service_response("routing", text, 0.0)
+    route = PBKK_script_api.analyze_routed(text, services=payload.get("services"),
+                                           timeout=float(payload.get("timeout", 60)), verbose=payload.get("verbose"))
+    response = _service_response(route["service"] or "routing", route["result"], route["time"])
+    response["route"] = {key: route[key] for key in ("hedged", "tried", "errors")}
+    return response
+
+
+def handle_analyze(payload):
+    if payload.get("routed"):
+        return handle_routed(payload)
+    service = payload.get("service", "gemini")
+    if service not in PBKK_script_api.AVAILABLE_SERVICES:
+        raise ValueError(f"Layanan '{service}' tidak dikenali.")
+    text = _input_text(payload)
+    if not isinstance(text, str):
+        return _service_response(service, text, 0.0)
+    start = time.perf_counter()
+    result = PBKK_script_api.analyze_text_directly(text, service, timeout=float(payload.get("timeout", 60)),
+                                                   verbose=payload.get("verbose"))
+    return _service_response(service, result, time.perf_counter() - start)
+
+
+def handle_analyze_stream(payload):
+    """Seperti handle_analyze, tetapi mengembalikan generator event (lihat stream_analyze_text).
+
+    Validasi input terjadi saat fungsi dipanggil, sebelum header respons dikirim.
+    """
+    service = payload.get("service", "gemini")
+    if service not in PBKK_script_api.AVAILABLE_SERVICES:
+        raise ValueError(f"Layanan '{service}' tidak dikenali.")
+    text = _input_text(payload)
+    if not isinstance(text, str):
+        return iter([{"type": "final", **_service_response(service, text, 0.0)}])
+    return PBKK_script_api.stream_analyze_text(text, service, timeout=float(payload.get("timeout", 60)))
+
+
+def handle_compare(payload):
+    services = payload.get("services") or PBKK_script_api.DEFAULT_SERVICES
+    unknown = [s for s in services if s not in PBKK_script_api.AVAILABLE_SERVICES]
+    if unknown:
+        raise ValueError(f"Layanan tidak dikenali: {', '.join(unknown)}")
+    if payload.get("text"):
+        file_path = "<text>"
+    elif payload.get("file"):
+        file_path = _allowed_file(payload["file"])
+    else:
+        raise ValueError('Payload harus berisi "text" atau "file".')
+    return PBKK_script_api.compare_all_services(
+        file_path,
+        concurrent=payload.get("concurrent", True),
+        provider_timeout=float(payload.get("timeout", 60)),
+        deadline=payload.get("deadline"),
+        services=services,
+        text=payload.get("text") or None,
+        verbose=payload.get("verbose"),
+        routed=payload.get("routed", False),
+    )
+
+
+def handle_analyze_url(payload):
+    url = payload.get("url")
+    if not url:
+        raise ValueError('Payload harus berisi "url".')
+    service = payload.get("service", "gemini")
+    start = time.perf_counter()
+    # Setiap redirect juga diperiksa agar tidak bisa dibelokkan ke host internal
+    text = PBKK_link_api.fetch_article_text(url, url_guard=check_public_url)
+    if not text:
+        return {"url": url, "_error": "Teks artikel tidak ditemukan."}
+    result = PBKK_link_api.analyze_text(text, api_service=service)
+    response = _service_response(service, result, time.perf_counter() - start)
+    response.update({"url": url, "chars": len(text)})
+    return response
+
+
+ROUTES = {
+    "/analyze": handle_analyze,
+    "/compare": handle_compare,
+    "/analyze_url": handle_analyze_url,
+}
+KNOWN_PATHS = set(ROUTES) | {"/health", "/metrics"}
+
+
+# ============================
+# Server HTTP
+# ============================
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "SentimentWorker/1.0"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self._send(status, data, "application/json; charset=utf-8", headers)
+
+    def _send(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        path = self.path.split("?")[0]
+        WORKER_REQUESTS.inc(endpoint=path if path in KNOWN_PATHS else "other", status=status)
+
+    def _send_events(self, events, headers):
+        """Kirim event sebagai Server-Sent Events (chunked) segera setelah masing-masing dihasilkan."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        WORKER_REQUESTS.inc(endpoint=self.path.split("?")[0], status=200)
+
+        def write_event(event):
+            data = f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+        try:
+            try:
+                for event in events:
+                    write_event(event)
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception as e:
+                logger.exception("Error saat streaming %s", self.path)
+                write_event({"type": "error", "error": str(e)})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Klien memutus koneksi di tengah stream
+            self.close_connection = True
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "queue": self.server.queue.stats(),
+                                  "providers": routing.get_health_stats()})
+        elif path == "/metrics":
+            body = render_prometheus() + self.server.queue.render_prometheus()
+            self._send(200, body.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send_json(404, {"_error": f"Endpoint {path} tidak ditemukan."})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"_error": f"Body request melebihi {MAX_BODY_BYTES} byte."},
+                            headers={"Connection": "close"})
+            self.close_connection = True
+            return
+        raw = self.rfile.read(length) if length else b""
+
+        handler = ROUTES.get(path)
+        if handler is None:
+            self._send_json(404, {"_error": f"Endpoint {path} tidak ditemukan."})
+            return
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            self._send_json(400, {"_error": "Body request bukan JSON yang valid."})
+            return
+
+        with request_context(self.headers.get("X-Request-ID")) as request_id:
+            headers = {"X-Request-ID": request_id}
+            try:
+                with self.server.queue.admit(), stage("worker_request", endpoint=path):
+                    if path == "/analyze" and payload.get("stream"):
+                        self._send_events(handle_analyze_stream(payload), headers)
+                        return
+                    body = handler(payload)
+            except QueueFull:
+                logger.warning("Antrian penuh, request %s ditolak", path)
+                self._send_json(503, {"_error": "Antrian worker penuh, coba lagi nanti."},
+                                headers={**headers, "Retry-After": "1"})
+                return
+            except ValueError as e:
+                self._send_json(400, {"_error": str(e)}, headers=headers)
+                return
+            except Exception as e:
+                logger.exception("Error saat memproses %s", path)
+                self._send_json(500, {"_error": str(e)}, headers=headers)
+                return
+            body["request_id"] = request_id
+            self._send_json(200, body, headers=headers)
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE):
+        super().__init__(address, AnalysisRequestHandler)
+        self.queue = RequestQueue(workers=workers, max_queue=queue_size)
+
+
+def warm_up():
+    """Muat bagian yang mahal sekali saja: engine leksikon lokal dan file cache."""
+    get_engine()
+    if PBKK_script_api.cache_enabled():
+        PBKK_script_api.get_result_cache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Alamat yang didengarkan (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Request yang diproses bersamaan (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help=f"Request yang boleh menunggu sebelum ditolak 503 (default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument("--log-level", default=None, help="Level log (default: SENTIMENT_LOG_LEVEL, INFO)")
+    parser.add_argument("--log-json", action="store_true", help="Tulis log sebagai baris JSON (dengan request_id)")
+    args = parser.parse_args()
+
+    configure_logging(level=args.log_level, json_logs=True if args.log_json else None)
+    PBKK_script_api.log_key_status()
+    warm_up()
+
+    server = AnalysisServer((args.host, args.port), workers=args.workers, queue_size=args.queue_size)
+    logger.info(f"Worker analisis berjalan di http://{args.host}:{server.server_port} "
+                f"({args.workers} worker, antrian {args.queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
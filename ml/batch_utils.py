@@ -0,0 +1,167 @@
+import csv
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Beberapa kolom teks berita di dataset bisa sangat panjang
+csv.field_size_limit(2**31 - 1)
+
+SUPPORTED_EXTENSIONS = (".html", ".htm", ".txt", ".jpg", ".jpeg", ".png")
+
+
+def iter_directory_items(directory):
+    """Yield satu item per file yang didukung di dalam `directory` (rekursif, urut nama)."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[-1].lower() in SUPPORTED_EXTENSIONS:
+                path = os.path.join(root, name)
+                yield {"id": os.path.relpath(path, directory), "file": path}
+
+
+def iter_csv_items(csv_path, text_column="text", id_column=None, keep_columns=()):
+    """Yield satu item per baris CSV tanpa memuat seluruh file ke memori.
+
+    `id` diambil dari `id_column` jika ada, kalau tidak memakai nomor baris.
+    Kolom di `keep_columns` ikut disalin ke item (misalnya label dataset).
+    """
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if text_column not in (reader.fieldnames or []):
+            raise ValueError(f"Kolom '{text_column}' tidak ada di {csv_path}. Kolom tersedia: {reader.fieldnames}")
+        for index, row in enumerate(reader):
+            item = {
+                "id": row.get(id_column) if id_column else f"row-{index}",
+                "text": row.get(text_column) or "",
+            }
+            for column in keep_columns:
+                item[column] = row.get(column)
+            yield item
+
+
+def iter_batch_items(path, text_column="text", id_column=None, keep_columns=()):
+    """Pilih sumber item berdasarkan `path`: folder berisi file, atau file CSV."""
+    if os.path.isdir(path):
+        return iter_directory_items(path)
+    if os.path.splitext(path)[-1].lower() == ".csv":
+        return iter_csv_items(path, text_column=text_column, id_column=id_column, keep_columns=keep_columns)
+    raise ValueError(f"Input batch harus berupa folder atau file .csv: {path}")
+
+
+def load_done_ids(output_path):
+    """Baca id yang sudah ada di file output (JSONL/CSV) agar batch bisa dilanjutkan.
+
+    Record yang berisi "_error" tidak dihitung selesai sehingga dicoba lagi saat dilanjutkan.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    if output_path.lower().endswith(".csv"):
+        with open(output_path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("id") and not row.get("_error"):
+                    done.add(row["id"])
+    else:
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if not record.get("_error"):
+                        done.add(record["id"])
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    # Baris terakhir bisa terpotong jika proses sebelumnya crash
+                    continue
+    return done
+
+
+class ResultWriter:
+    """Tulis hasil satu per satu (append + flush) ke JSONL atau CSV."""
+
+    def __init__(self, output_path, fieldnames=None):
+        self.output_path = output_path
+        self.is_csv = output_path.lower().endswith(".csv")
+        new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self._file = open(output_path, "a", encoding="utf-8", newline="")
+        self._csv = None
+        if self.is_csv:
+            if not fieldnames:
+                raise ValueError("fieldnames wajib diisi untuk output CSV")
+            self._csv = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, record):
+        if self._csv:
+            # Nilai bertingkat (hasil mentah API) ditulis sebagai JSON, bukan repr Python
+            self._csv.writerow({k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                                for k, v in record.items()})
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_chunks(items, size):
+    """Kelompokkan iterator `items` menjadi list berukuran paling banyak `size`."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(items, process_chunk, writer, workers=4, done_ids=None, chunk_size=1):
+    """Proses `items` dengan paralelisme terbatas dan tulis hasil begitu selesai.
+
+    Item dikelompokkan per `chunk_size`; `process_chunk` menerima list item
+    dan mengembalikan list record dengan urutan yang sama. Paling banyak
+    `workers * 2` chunk berada di memori sekaligus, sehingga dataset besar
+    tetap diproses secara streaming. Item yang id-nya ada di `done_ids`
+    dilewati. Mengembalikan dict jumlah item processed/skipped/failed.
+    """
+    done_ids = done_ids or set()
+    counts = {"processed": 0, "skipped": 0, "failed": 0}
+    max_pending = max(1, workers * 2)
+
+    def remaining():
+        for item in items:
+            if item["id"] in done_ids:
+                counts["skipped"] += 1
+                continue
+            yield item
+
+    def collect(finished):
+        for future in finished:
+            chunk = pending.pop(future)
+            try:
+                records = future.result()
+            except Exception as e:
+                records = [{"id": item["id"], "_error": str(e)} for item in chunk]
+                counts["failed"] += len(chunk)
+            for record in records:
+                writer.write(record)
+            counts["processed"] += len(chunk)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for chunk in iter_chunks(remaining(), max(1, chunk_size)):
+            pending[executor.submit(process_chunk, chunk)] = chunk
+            if len(pending) >= max_pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+
+    return counts
@@ -0,0 +1,77 @@
+"""Micro-benchmark ekstraksi teks HTML: BeautifulSoup (html.parser) vs lxml streaming.
+
+Contoh:
+    python benchmarks/bench_html_extract.py                 # berita.html, 20 ulangan
+    python benchmarks/bench_html_extract.py --scale 10      # halaman 10x lebih besar
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_DIR)
+
+from html_extract import fast_extractor_available, html_to_text  # noqa: E402
+
+
+def measure(html_text, extractor, repeat):
+    """Kembalikan (teks, throughput halaman/detik, MB/detik, peak memori MB)."""
+    # Pemanasan, sekaligus ambil teks untuk dibandingkan
+    text = html_to_text(html_text, extractor=extractor)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        html_to_text(html_text, extractor=extractor)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    html_to_text(html_text, extractor=extractor)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size_mb = len(html_text.encode("utf-8")) / 1e6
+    return text, repeat / elapsed, size_mb * repeat / elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", default=os.path.join(ML_DIR, "berita.html"), help="File HTML (default: berita.html)")
+    parser.add_argument("--repeat", type=int, default=20, help="Jumlah ulangan per extractor (default: 20)")
+    parser.add_argument("--scale", type=int, default=1, help="Perbesar halaman dengan mengulang isinya N kali")
+    parser.add_argument("--json", action="store_true", help="Cetak hasil sebagai JSON")
+    args = parser.parse_args()
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        html_text = f.read() * args.scale
+
+    extractors = ["bs4"] + (["fast"] if fast_extractor_available() else [])
+    results, texts = {}, {}
+    for extractor in extractors:
+        text, pages_per_sec, mb_per_sec, peak_mb = measure(html_text, extractor, args.repeat)
+        texts[extractor] = text
+        results[extractor] = {
+            "pages_per_sec": round(pages_per_sec, 2),
+            "mb_per_sec": round(mb_per_sec, 2),
+            "peak_memory_mb": round(peak_mb, 2),
+        }
+    same_text = len(set(texts.values())) == 1
+
+    if args.json:
+        print(json.dumps({"file": args.file, "scale": args.scale, "same_text": same_text, "results": results}, indent=2))
+        return
+
+    print(f"File: {args.file} (x{args.scale}, {len(html_text.encode('utf-8')) / 1e6:.2f} MB), {args.repeat} ulangan")
+    print(f"{'extractor':<10} {'halaman/s':>10} {'MB/s':>8} {'peak MB':>9}")
+    for extractor, r in results.items():
+        print(f"{extractor:<10} {r['pages_per_sec']:>10} {r['mb_per_sec']:>8} {r['peak_memory_mb']:>9}")
+    if "fast" in results:
+        speedup = results["fast"]["pages_per_sec"] / results["bs4"]["pages_per_sec"]
+        print(f"Percepatan fast vs bs4: {speedup:.1f}x")
+    print(f"Teks identik: {'ya' if same_text else 'TIDAK'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Benchmark end-to-end pipeline analisis memakai server stub lokal (tanpa kuota API).
+
+Mengukur analyze_input, compare_all_services dan fetch_article_text dalam mode
+serial dan concurrent: latensi p50/p95/p99, dokumen/detik dan kenaikan puncak RSS
+per skenario.
+Skenario stream_to_label mengukur waktu sampai label pertama pada mode streaming,
+dan analyze_routed mengukur mode routing (satu jawaban, hedge & circuit breaker).
+Dengan --slow-provider sebagian request ke satu provider dibuat lambat untuk
+melihat efek hedge pada latensi ekor.
+Korpus diambil dari testing/*.csv (kolom "text") dan berita.html / berita.png.
+
+Contoh:
+    python benchmarks/bench_pipeline.py --docs 50 --latency 0.05 --output baseline.json
+    python benchmarks/bench_pipeline.py --docs 50 --latency 0.05 --baseline baseline.json
+    python benchmarks/bench_pipeline.py --docs 50 --slow-provider gemini --slow-rate 0.1 --slow-latency 3
+"""
+import argparse
+import csv
+import gc
+import glob
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubServer  # noqa: E402
+
+csv.field_size_limit(2**31 - 1)
+
+
+def current_rss_mb():
+    """RSS proses saat ini (MB) dari /proc, atau None jika tidak tersedia (selain Linux)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class RssPeak:
+    """Kenaikan RSS tertinggi selama satu skenario dibanding RSS tepat sebelum skenario (MB).
+
+    ru_maxrss hanya naik sepanjang umur proses sehingga skenario setelah yang
+    pertama melaporkan puncak kumulatif; di sini RSS disampel di thread latar
+    selama skenario berjalan. `delta_mb` bernilai None jika RSS tidak bisa dibaca.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak = max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        gc.collect()
+        self.baseline = self.peak = current_rss_mb()
+        if self.baseline is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+        return False
+
+    @property
+    def delta_mb(self):
+        if self.baseline is None:
+            return None
+        return round(self.peak - self.baseline, 1)
+
+
+def percentile(values, pct):
+    """Persentil nearest-rank dari list angka."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def load_corpus(limit, workdir):
+    """Tulis teks dari testing/*.csv ke file .txt sementara, ditambah berita.html dan berita.png."""
+    paths = [os.path.join(ML_DIR, "berita.html"), os.path.join(ML_DIR, "berita.png")]
+    for csv_path in sorted(glob.glob(os.path.join(ML_DIR, "testing", "*.csv"))):
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            if "text" not in (reader.fieldnames or []):
+                continue
+            for row in reader:
+                if len(paths) >= limit:
+                    return paths
+                if not (row.get("text") or "").strip():
+                    continue
+                path = os.path.join(workdir, f"doc_{len(paths):05d}.txt")
+                with open(path, "w", encoding="utf-8") as out:
+                    out.write(row["text"])
+                paths.append(path)
+    return paths[:limit]
+
+
+def run_scenario(fn, items, workers):
+    """Jalankan `fn` untuk setiap item (serial jika workers <= 1) dan ukur latensinya."""
+    def one(item):
+        start = time.perf_counter()
+        try:
+            ok = fn(item)
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    with RssPeak() as rss:
+        start = time.perf_counter()
+        if workers <= 1:
+            outcomes = [one(item) for item in items]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(one, items))
+        wall = time.perf_counter() - start
+
+    latencies = [lat * 1000 for lat, _ in outcomes]
+    return {
+        "docs": len(items),
+        "workers": workers,
+        "wall_s": round(wall, 3),
+        "docs_per_sec": round(len(items) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "rss_delta_mb": rss.delta_mb,
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Bandingkan hasil dengan baseline; kembalikan daftar regresi (teks)."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if previous["docs_per_sec"] and current["docs_per_sec"] < previous["docs_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: docs/s {previous['docs_per_sec']} -> {current['docs_per_sec']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=30, help="Jumlah dokumen korpus (default: 30)")
+    parser.add_argument("--workers", type=int, default=8, help="Jumlah dokumen bersamaan pada mode concurrent (default: 8)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latensi stub per request, detik (default: 0.05)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang stub membalas 500 (default: 0)")
+    parser.add_argument("--slow-provider", choices=["gemini", "openrouter", "hf"], help="Provider stub yang sebagian request-nya lambat")
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="Peluang request ke --slow-provider lambat (default: 0.1)")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="Latensi request lambat, detik (default: 3)")
+    parser.add_argument("--service", default="gemini", help="Layanan untuk skenario analyze_input (default: gemini)")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON (bisa dipakai sebagai baseline)")
+    parser.add_argument("--baseline", help="File JSON hasil sebelumnya untuk dibandingkan")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Toleransi regresi relatif (default: 0.2 = 20%%)")
+    parser.add_argument("--verbose", action="store_true", help="Tampilkan log progres pipeline (level INFO)")
+    parser.add_argument("--metrics", help="Simpan metrik per tahap pipeline (format Prometheus) ke file ini")
+    args = parser.parse_args()
+
+    with open(os.path.join(ML_DIR, "berita.html"), "r", encoding="utf-8") as f:
+        news_html = f.read()
+
+    slow = {args.slow_provider: (args.slow_rate, args.slow_latency)} if args.slow_provider else None
+    with StubServer(latency=args.latency, error_rate=args.error_rate, news_html=news_html, slow=slow) as stub, \
+            tempfile.TemporaryDirectory() as workdir:
+        # Arahkan semua provider ke stub sebelum modul pipeline diimpor
+        os.environ.update(stub.endpoints())
+        os.environ.update({
+            "API_KEY_GEMINI": "stub", "API_KEY_DEEPSEEK": "stub", "API_KEY_BERT": "stub", "API_KEY_OCR": "stub",
+            "SENTIMENT_CACHE": "0",
+            "SENTIMENT_LOCAL_FALLBACK": "0",
+            "SENTIMENT_CACHE_DIR": os.path.join(workdir, "cache"),
+        })
+        import PBKK_link_api
+        import PBKK_script_api
+        import metrics
+        metrics.configure_logging(level="INFO" if args.verbose else "ERROR")
+
+        corpus = load_corpus(args.docs, workdir)
+        urls = [f"{stub.base_url}/news/{i}" for i in range(len(corpus))]
+
+        def analyze_ok(path):
+            result = PBKK_script_api.analyze_input(path, args.service)
+            return bool(result) and not (isinstance(result, dict) and result.get("_error"))
+
+        def stream_label_ok(path):
+            text = PBKK_script_api.extract_input(path)
+            for event in PBKK_script_api.stream_analyze_text(text, args.service):
+                if event["type"] == "label":
+                    return True
+            return False
+
+        def routed_ok(path):
+            route = PBKK_script_api.analyze_routed(PBKK_script_api.extract_input(path))
+            return route["service"] is not None
+
+        def compare_ok(path, concurrent):
+            results = PBKK_script_api.compare_all_services(path, concurrent=concurrent)
+            return not any(str(results.get(s, "")).startswith("ERROR") for s in PBKK_script_api.DEFAULT_SERVICES)
+
+        scenarios = {
+            "analyze_input/serial": (analyze_ok, corpus, 1),
+            "analyze_input/concurrent": (analyze_ok, corpus, args.workers),
+            "stream_to_label/serial": (stream_label_ok, corpus, 1),
+            "analyze_routed/serial": (routed_ok, corpus, 1),
+            "analyze_routed/concurrent": (routed_ok, corpus, args.workers),
+            "compare_all_services/serial": (lambda p: compare_ok(p, False), corpus, 1),
+            "compare_all_services/concurrent": (lambda p: compare_ok(p, True), corpus, args.workers),
+            "fetch_article_text/serial": (lambda u: bool(PBKK_link_api.fetch_article_text(u)), urls, 1),
+            "fetch_article_text/concurrent": (lambda u: bool(PBKK_link_api.fetch_article_text(u)), urls, args.workers),
+        }
+
+        results = {
+            "config": {
+                "docs": len(corpus), "workers": args.workers, "latency": args.latency,
+                "error_rate": args.error_rate, "service": args.service, "slow": slow,
+            },
+            "scenarios": {},
+        }
+        for name, (fn, items, workers) in scenarios.items():
+            results["scenarios"][name] = run_scenario(fn, items, workers)
+        results["stub"] = stub.stats()
+        if args.metrics:
+            metrics.write_prometheus(args.metrics)
+
+    print(f"{'skenario':<34} {'docs/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'error':>6} {'+RSS MB':>7}")
+    for name, r in results["scenarios"].items():
+        print(f"{name:<34} {r['docs_per_sec']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['errors']:>6} {str(r['rss_delta_mb']):>7}")
+    print(f"Request ke stub: {results['stub']['requests']} (error {results['stub']['errors']})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print("REGRESI dibanding baseline:")
+            for line in regressions:
+                print(f" - {line}")
+            sys.exit(1)
+        print("Tidak ada regresi dibanding baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Server HTTP lokal yang meniru bentuk respons Gemini, OpenRouter, HuggingFace dan OCR.Space.
+
+Dipakai oleh benchmark agar pipeline bisa diukur tanpa memakai kuota API.
+Latensi dan tingkat error bisa diatur. Request dengan JSON schema
+(generationConfig / response_format) dijawab JSON ringkas. Streaming Gemini
+(streamGenerateContent) dan OpenRouter ("stream": true) dikirim sebagai
+Server-Sent Events; event pertama tiba setelah `latency`, event berikutnya
+setiap `latency * 0.1`. `slow` membuat sebagian request ke satu provider
+lambat, misalnya {"hf": (0.2, 3.0)}: 20% request ke /hf butuh 3 detik
+(meniru model HuggingFace yang sedang "tidur").
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LABEL_TEXTS = [
+    "Sentimen: **Positif**. Teks menyoroti keberhasilan dan bantuan.",
+    "Sentimen: **Negatif**. Teks membahas kerugian dan konflik.",
+    "Sentimen: **Netral**. Teks bersifat informatif.",
+]
+
+LABEL_JSON = [
+    {"label": "positif", "score": 0.86, "highlights": ["keberhasilan", "bantuan"]},
+    {"label": "negatif", "score": 0.91, "highlights": ["kerugian", "konflik"]},
+    {"label": "netral", "score": 0.74, "highlights": ["informatif"]},
+]
+
+
+def _stream_pieces(text, words_per_piece=3):
+    words = text.split(" ")
+    return [" ".join(words[i:i + words_per_piece]) + (" " if i + words_per_piece < len(words) else "")
+            for i in range(0, len(words), words_per_piece)]
+
+
+def _bert_scores(text):
+    stars = len(text) % 5 + 1
+    return [
+        {"label": f"{stars} stars", "score": 0.7},
+        {"label": f"{stars % 5 + 1} stars", "score": 0.3},
+    ]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Header dan body ditulis terpisah; tanpa TCP_NODELAY body tertahan Nagle/delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_sse(self, events):
+        """Kirim event SSE memakai chunked transfer encoding, dengan jeda antar event."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, event in enumerate(events):
+                if i:
+                    time.sleep(self.server.config["latency"] * 0.1)
+                if isinstance(event, str) and event.startswith(":"):
+                    data = f"{event}\r\n\r\n".encode("utf-8")
+                else:
+                    data = f"data: {event if isinstance(event, str) else json.dumps(event)}\r\n\r\n".encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Klien berhenti membaca lebih awal (misalnya setelah label diterima)
+            self.close_connection = True
+
+    def _simulate(self):
+        """Tunggu sesuai latensi; kembalikan True jika request ini harus gagal."""
+        config = self.server.config
+        delay = config["latency"] * random.uniform(1 - config["jitter"], 1 + config["jitter"])
+        prefix = self.path.strip("/").split("/")[0]
+        rate, slow_latency = config["slow"].get(prefix, (0.0, 0.0))
+        if random.random() < rate:
+            delay = slow_latency
+        time.sleep(max(0.0, delay))
+        with self.server.lock:
+            self.server.requests += 1
+        if random.random() < config["error_rate"]:
+            with self.server.lock:
+                self.server.errors += 1
+            self._send(500, {"error": "stub error"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self._simulate():
+            return
+        if self.path.startswith("/news"):
+            self._send(200, self.server.config["news_html"], content_type="text/html; charset=utf-8")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self._simulate():
+            return
+        if self.path.startswith("/ocr"):
+            self._send(200, {
+                "ParsedResults": [{"ParsedText": self.server.config["ocr_text"]}],
+                "IsErroredOnProcessing": False,
+            })
+            return
+
+        payload = json.loads(raw or b"{}")
+        if self.path.startswith("/gemini"):
+            text = random.choice(LABEL_TEXTS)
+            if (payload.get("generationConfig") or {}).get("responseMimeType") == "application/json":
+                text = json.dumps(random.choice(LABEL_JSON))
+            if "streamGenerateContent" in self.path:
+                self._send_sse([{"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+                                for piece in _stream_pieces(text)])
+            else:
+                self._send(200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]})
+        elif self.path.startswith("/openrouter"):
+            text = json.dumps(random.choice(LABEL_JSON)) if payload.get("response_format") else random.choice(LABEL_TEXTS)
+            if payload.get("stream"):
+                # OpenRouter mengirim komentar keep-alive sebelum token pertama
+                self._send_sse([": OPENROUTER PROCESSING"]
+                               + [{"choices": [{"delta": {"content": piece}}]} for piece in _stream_pieces(text)]
+                               + ["[DONE]"])
+            else:
+                self._send(200, {"choices": [{"message": {"role": "assistant", "content": text}}]})
+        elif self.path.startswith("/hf"):
+            inputs = payload.get("inputs")
+            if isinstance(inputs, list):
+                self._send(200, [_bert_scores(t) for t in inputs])
+            else:
+                self._send(200, [_bert_scores(inputs or "")])
+        else:
+            self._send(404, {"error": "not found"})
+
+
+class StubServer:
+    """Jalankan semua stub di satu port lokal (thread terpisah)."""
+
+    def __init__(self, latency=0.05, jitter=0.2, error_rate=0.0, news_html="", ocr_text="stub ocr text", slow=None):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.httpd.errors = 0
+        self.httpd.config = {
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "news_html": news_html.encode("utf-8") if isinstance(news_html, str) else news_html,
+            "ocr_text": ocr_text,
+            "slow": dict(slow or {}),
+        }
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def endpoints(self):
+        """Variabel environment yang mengarahkan pipeline ke stub ini."""
+        return {
+            "ENDPOINT_GEMINI": f"{self.base_url}/gemini/models/gemini-2.0-flash:generateContent",
+            "ENDPOINT_DEEPSEEK": f"{self.base_url}/openrouter/chat/completions",
+            "ENDPOINT_BERT": f"{self.base_url}/hf/models/nlptown/bert-base-multilingual-uncased-sentiment",
+            "ENDPOINT_OCR": f"{self.base_url}/ocr/parse/image",
+        }
+
+    def stats(self):
+        return {"requests": self.httpd.requests, "errors": self.httpd.errors}
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Folder cache default: ml/.cache (bisa diganti lewat SENTIMENT_CACHE_DIR)
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+def get_cache_dir():
+    """Folder tempat file cache disimpan (dibaca saat dipakai, setelah .env dimuat)."""
+    return os.getenv("SENTIMENT_CACHE_DIR") or DEFAULT_CACHE_DIR
+
+
+def normalize_text(text):
+    """Normalisasi teks untuk kunci cache: NFC, whitespace dirapikan."""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+
+def make_key(*parts):
+    """Buat kunci cache (SHA-256 hex) dari beberapa bagian string."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+class SQLiteCache:
+    """Cache key/value persisten di SQLite dengan TTL dan eviksi LRU.
+
+    Nilai disimpan sebagai JSON. `ttl` dalam detik (None = tidak kedaluwarsa),
+    `max_entries` membatasi jumlah entri; entri yang paling lama tidak
+    diakses dibuang lebih dulu. Aman dipakai dari banyak thread.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access)")
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        """Ambil nilai untuk `key`, atau None jika tidak ada / kedaluwarsa."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self._expired(created, now):
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        """Simpan `value` (harus bisa di-serialize ke JSON) untuk `key`."""
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        if not self.max_entries:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def invalidate(self, key):
+        """Hapus satu entri. Mengembalikan True jika entri tersebut ada."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cur.rowcount > 0
+
+    def clear(self):
+        """Hapus semua entri."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def stats(self):
+        """Statistik cache: hits, misses, evictions, entries, hit_rate."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name, ttl=None, max_entries=10000):
+    """Ambil (atau buat) cache bernama `name` di folder cache. Satu instance per proses."""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = SQLiteCache(os.path.join(get_cache_dir(), f"{name}.sqlite"), ttl=ttl, max_entries=max_entries)
+            _caches[name] = cache
+        return cache
+
+
+def cache_enabled():
+    """Cache bisa dimatikan global dengan SENTIMENT_CACHE=0."""
+    return os.getenv("SENTIMENT_CACHE", "1").lower() not in ("0", "false", "no", "off")
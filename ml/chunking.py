@@ -0,0 +1,122 @@
+import math
+import os
+import re
+
+# Perkiraan jumlah token per kata (tokenizer subword rata-rata sedikit di atas 1 token/kata)
+TOKENS_PER_WORD = 1.4
+
+# Anggaran token per bagian untuk setiap provider; bisa diganti lewat CHUNK_TOKENS_<NAMA>.
+# BERT (nlptown) memotong input di 512 token, jadi diberi margin.
+DEFAULT_CHUNK_TOKENS = {
+    "bert": 400,
+    "deepseek": 4000,
+    "gemini": 8000,
+}
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+WORD_RE = re.compile(r"\S+")
+
+
+def estimate_tokens(text):
+    """Perkiraan kasar jumlah token dari jumlah kata."""
+    return math.ceil(len(WORD_RE.findall(text or "")) * TOKENS_PER_WORD)
+
+
+def chunk_token_budget(api_service):
+    """Anggaran token per bagian untuk `api_service`, atau None jika tidak perlu dipotong."""
+    value = os.getenv(f"CHUNK_TOKENS_{api_service.upper()}")
+    if value:
+        return int(value)
+    return DEFAULT_CHUNK_TOKENS.get(api_service)
+
+
+def _split_spans(text, start, end, pattern):
+    """Pecah text[start:end] pada `pattern`; kembalikan span (start, end) tanpa pemisah."""
+    spans, pos = [], start
+    for match in pattern.finditer(text, start, end):
+        if match.start() > pos:
+            spans.append((pos, match.start()))
+        pos = match.end()
+    if pos < end:
+        spans.append((pos, end))
+    return spans
+
+
+def _word_spans(text, start, end, max_tokens):
+    """Potong satu kalimat yang terlalu panjang per kelompok kata."""
+    words_per_chunk = max(1, int(max_tokens / TOKENS_PER_WORD))
+    words = [(m.start(), m.end()) for m in WORD_RE.finditer(text, start, end)]
+    return [
+        (words[i][0], words[min(i + words_per_chunk, len(words)) - 1][1])
+        for i in range(0, len(words), words_per_chunk)
+    ]
+
+
+def split_into_chunks(text, max_tokens):
+    """Bagi `text` menjadi span (start, end) yang masing-masing muat dalam `max_tokens`.
+
+    Batas paragraf diutamakan, lalu batas kalimat; kalimat yang tetap terlalu
+    panjang dipotong per kata. Span menunjuk ke posisi karakter di `text`
+    asli sehingga hasil per bagian bisa dipetakan kembali ke sumbernya.
+    """
+    units = []
+    for p_start, p_end in _split_spans(text, 0, len(text), PARAGRAPH_RE):
+        if estimate_tokens(text[p_start:p_end]) <= max_tokens:
+            units.append((p_start, p_end))
+            continue
+        for s_start, s_end in _split_spans(text, p_start, p_end, SENTENCE_RE):
+            if estimate_tokens(text[s_start:s_end]) <= max_tokens:
+                units.append((s_start, s_end))
+            else:
+                units.extend(_word_spans(text, s_start, s_end, max_tokens))
+
+    # Gabungkan unit berurutan selama masih muat dalam anggaran
+    chunks, current, current_tokens = [], None, 0
+    for u_start, u_end in units:
+        tokens = estimate_tokens(text[u_start:u_end])
+        if current and current_tokens + tokens <= max_tokens:
+            current = (current[0], u_end)
+            current_tokens += tokens
+        else:
+            if current:
+                chunks.append(current)
+            current, current_tokens = (u_start, u_end), tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def trim_to_token_budget(text, max_tokens):
+    """Potong `text` pada batas kata sehingga muat dalam `max_tokens` (bagian awal dipertahankan).
+
+    Teks yang sudah muat, atau `max_tokens` kosong, dikembalikan apa adanya.
+    """
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return text
+    words = max(1, int(max_tokens / TOKENS_PER_WORD))
+    for i, match in enumerate(WORD_RE.finditer(text), 1):
+        if i == words:
+            return text[:match.end()]
+    return text
+
+
+def merge_chunk_labels(chunks):
+    """Gabungkan label per bagian menjadi satu label dokumen.
+
+    `chunks` berisi dict dengan key "label", "score" (keyakinan 0-1, None = 1)
+    dan "start"/"end". Setiap bagian diberi bobot sepanjang teksnya; label
+    dengan total bobot x keyakinan terbesar menang. Mengembalikan
+    (label, keyakinan) atau (None, 0.0) jika tidak ada label yang terbaca.
+    """
+    totals, total_weight = {}, 0.0
+    for chunk in chunks:
+        weight = max(1, chunk["end"] - chunk["start"])
+        total_weight += weight
+        if chunk.get("label"):
+            confidence = 1.0 if chunk.get("score") is None else chunk["score"]
+            totals[chunk["label"]] = totals.get(chunk["label"], 0.0) + weight * confidence
+    if not totals:
+        return None, 0.0
+    label = max(totals, key=totals.get)
+    return label, round(totals[label] / total_weight, 4)
@@ -0,0 +1,306 @@
+"""Evaluasi layanan analisis sentimen terhadap dataset berlabel (misalnya testing/balanced_samples.csv).
+
+Setiap pasangan (baris, layanan) adalah satu "sel" yang ditulis ke file JSONL
+(`--cells`, default <input>_cells.jsonl): label, skor, latensi, perkiraan
+token & biaya, atau pesan error. Menjalankan ulang hanya menghitung sel yang
+belum ada (atau yang teksnya berubah), sehingga menambah layanan atau baris
+baru tidak mengulang pekerjaan lama. CSV dibaca per potongan (`--chunksize`)
+sehingga korpus besar tidak dimuat seluruhnya.
+
+Laporan per layanan: akurasi, macro-F1, confusion matrix, latensi p50/p95 dan
+perkiraan biaya. Label dataset boleh berupa angka (1.0 positif, 0.0 netral,
+-1.0 negatif) atau teks (positif/negatif/netral).
+
+Contoh:
+    python evaluate.py testing/balanced_samples.csv --services gemini,deepseek,bert,local
+    python evaluate.py testing/balanced_samples.csv --services local --report testing/eval_report.json
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import PBKK_script_api
+from batch_utils import ResultWriter
+from cache_utils import make_key, normalize_text
+from chunking import estimate_tokens
+from local_sentiment import analyze_local_many
+from metrics import configure_logging, request_context
+
+logger = logging.getLogger(__name__)
+
+# Urutan kode label; tanda angka dataset + 1 langsung menjadi indeks di sini
+LABELS = ("negatif", "netral", "positif")
+LABEL_CODES = {label: i for i, label in enumerate(LABELS)}
+# Kolom tambahan confusion matrix untuk sel tanpa label (error / label tidak terbaca)
+NO_LABEL = len(LABELS)
+
+# Perkiraan harga USD per 1 juta token (input, output); ganti lewat PRICE_<NAMA>="input,output"
+DEFAULT_PRICES = {
+    "gemini": (0.10, 0.40),
+    "deepseek": (0.27, 1.10),
+    "bert": (0.0, 0.0),
+    "local": (0.0, 0.0),
+}
+
+
+def get_price(service):
+    value = os.getenv(f"PRICE_{service.upper()}")
+    if value:
+        price_in, price_out = (float(v) for v in value.split(","))
+        return price_in, price_out
+    return DEFAULT_PRICES.get(service, (0.0, 0.0))
+
+
+def text_hash(text):
+    """Sidik jari pendek teks ternormalisasi; sel lama diabaikan jika teks barisnya berubah."""
+    return make_key(normalize_text(text))[:16]
+
+
+def truth_codes(values):
+    """Ubah kolom label dataset menjadi kode LABELS (np.int8); -1 jika tidak dikenali."""
+    numeric = pd.to_numeric(values, errors="coerce")
+    is_number = numeric.notna().to_numpy()
+    codes = np.full(len(values), -1, dtype=np.int8)
+    codes[is_number] = np.sign(numeric.to_numpy()[is_number]).astype(np.int8) + 1
+    if not is_number.all():
+        words = values[~is_number].astype(str).str.strip().str.lower().map(PBKK_script_api.LABEL_WORDS)
+        codes[~is_number] = words.map(LABEL_CODES).fillna(-1).to_numpy(dtype=np.int8)
+    return codes
+
+
+def iter_corpus(path, text_column="text", label_column="sentiment", id_column=None, chunksize=1000):
+    """Baca CSV per potongan; yield DataFrame berkolom id, text, hash, truth."""
+    offset = 0
+    for frame in pd.read_csv(path, chunksize=chunksize, dtype={text_column: str}, keep_default_na=False):
+        for column in (text_column, label_column):
+            if column not in frame.columns:
+                raise ValueError(f"Kolom '{column}' tidak ada di {path}. Kolom tersedia: {list(frame.columns)}")
+        # id sama dengan mode --batch: kolom id jika ada, kalau tidak nomor baris
+        ids = (frame[id_column].astype(str) if id_column
+               else pd.Series([f"row-{i}" for i in range(offset, offset + len(frame))], index=frame.index))
+        offset += len(frame)
+        texts = frame[text_column]
+        yield pd.DataFrame({
+            "id": ids.to_numpy(),
+            "text": texts.to_numpy(),
+            "hash": texts.map(text_hash).to_numpy(),
+            "truth": truth_codes(frame[label_column]),
+        })
+
+
+def load_cells(cells_path):
+    """Baca semua sel yang sudah dihitung; sel terakhir menang jika (id, layanan) tercatat dua kali."""
+    records = []
+    if os.path.exists(cells_path):
+        with open(cells_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Baris terakhir bisa terpotong jika proses sebelumnya crash
+                    continue
+    columns = ["id", "service", "hash", "label", "score", "latency", "tokens_in", "tokens_out", "cost", "error"]
+    cells = pd.DataFrame.from_records(records, columns=columns)
+    return cells.drop_duplicates(["id", "service"], keep="last").reset_index(drop=True)
+
+
+def _cell(row_id, row_hash, service, text, result, latency):
+    """Satu record sel dari hasil mentah layanan."""
+    error = result.get("_error") if isinstance(result, dict) else (None if result else "hasil kosong")
+    label, score = (None, None) if error else PBKK_script_api.extract_sentiment_label(service, result)
+    api_config = PBKK_script_api.get_api_config(service) if service != "local" else None
+    prompt = (api_config or {}).get("prompt") or "{text}"
+    # Request yang gagal dianggap tidak ditagih
+    tokens_in = 0 if error or service == "local" else estimate_tokens(prompt.format(text=text))
+    tokens_out = 0 if error or service in ("bert", "local") else estimate_tokens(
+        PBKK_script_api.normalize_api_result(service, result) or "")
+    price_in, price_out = get_price(service)
+    return {
+        "id": row_id,
+        "service": service,
+        "hash": row_hash,
+        "label": label,
+        "score": score,
+        "latency": round(latency, 6),
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "cost": round((tokens_in * price_in + tokens_out * price_out) / 1e6, 8),
+        "error": error if error else (None if label else "label tidak terbaca"),
+    }
+
+
+def compute_cells(rows, service, timeout=60):
+    """Hitung sel untuk `rows` (list (id, hash, text)) dengan satu layanan.
+
+    Engine lokal dan BERT dipanggil sekali per kelompok (waktu dibagi rata),
+    layanan lain per baris. Fallback lokal dimatikan agar error provider
+    tercatat sebagai error, bukan sebagai jawaban engine lokal.
+    """
+    texts = [text for _, _, text in rows]
+    start = time.perf_counter()
+    if service == "local":
+        results = analyze_local_many(texts)
+    elif service == "bert":
+        results = PBKK_script_api.analyze_texts_bert_batch(texts, timeout=timeout, fallback=False)
+    else:
+        row_id, row_hash, text = rows[0]
+        result = PBKK_script_api.analyze_text_directly(text, service, timeout=timeout, fallback=False)
+        return [_cell(row_id, row_hash, service, text, result, time.perf_counter() - start)]
+    per_item = (time.perf_counter() - start) / max(1, len(rows))
+    return [_cell(row_id, row_hash, service, text, result, per_item)
+            for (row_id, row_hash, text), result in zip(rows, results)]
+
+
+def _tasks(missing, service, group_size):
+    """Bagi baris yang belum punya sel menjadi tugas pool: per kelompok (BERT/lokal) atau per baris."""
+    rows = list(zip(missing["id"], missing["hash"], missing["text"]))
+    size = len(rows) if service == "local" else (group_size if service == "bert" else 1)
+    return [rows[i:i + size] for i in range(0, len(rows), max(1, size))]
+
+
+def run_evaluation(input_path, services, cells_path, text_column="text", label_column="sentiment",
+                   id_column=None, chunksize=1000, workers=4, timeout=60, retry_errors=False,
+                   bert_batch_size=PBKK_script_api.BERT_BATCH_SIZE):
+    """Lengkapi sel yang belum ada untuk setiap (baris, layanan), lalu hitung metrik dari semua sel.
+
+    Mengembalikan (laporan per layanan, jumlah sel {"computed", "reused"}).
+    """
+    cells = load_cells(cells_path)
+    if retry_errors:
+        cells = cells[cells["error"].isna()]
+    done = set(cells["id"].astype(str) + "\x1f" + cells["service"] + "\x1f" + cells["hash"].astype(str))
+
+    truth_frames, counts = [], {"computed": 0, "reused": 0}
+    with ResultWriter(cells_path) as writer, ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for chunk in iter_corpus(input_path, text_column, label_column, id_column, chunksize):
+            truth_frames.append(chunk[["id", "hash", "truth"]])
+            futures = []
+            for service in services:
+                keys = chunk["id"] + "\x1f" + service + "\x1f" + chunk["hash"]
+                missing = chunk[~keys.isin(done)]
+                counts["reused"] += len(chunk) - len(missing)
+                for rows in _tasks(missing, service, bert_batch_size):
+                    futures.append(executor.submit(compute_cells, rows, service, timeout))
+            for future in as_completed(futures):
+                for cell in future.result():
+                    writer.write(cell)
+                    counts["computed"] += 1
+            logger.info(f"Evaluasi: {len(chunk)} baris diproses, {counts['computed']} sel baru sejauh ini.")
+
+    truth = pd.concat(truth_frames, ignore_index=True) if truth_frames else pd.DataFrame(columns=["id", "hash", "truth"])
+    return compute_report(load_cells(cells_path), truth, services), counts
+
+
+def confusion_matrix(truth, predicted):
+    """Confusion matrix (baris = label dataset, kolom = prediksi + kolom "tanpa label") lewat np.bincount."""
+    n_pred = NO_LABEL + 1
+    counts = np.bincount(truth.astype(np.int64) * n_pred + predicted, minlength=len(LABELS) * n_pred)
+    return counts.reshape(len(LABELS), n_pred)
+
+
+def macro_f1(matrix):
+    """Rata-rata F1 per label, hanya untuk label yang muncul di dataset atau prediksi."""
+    square = matrix[:, :len(LABELS)]
+    true_positive = np.diag(square).astype(float)
+    support = matrix.sum(axis=1)
+    predicted = square.sum(axis=0)
+    present = (support > 0) | (predicted > 0)
+    if not present.any():
+        return 0.0
+    denominator = support + predicted
+    f1 = np.divide(2 * true_positive, denominator, out=np.zeros_like(true_positive), where=denominator > 0)
+    return float(f1[present].mean())
+
+
+def compute_report(cells, truth, services):
+    """Metrik per layanan dari sel yang cocok dengan baris korpus saat ini (id dan hash teks sama)."""
+    truth = truth[truth["truth"] >= 0]
+    merged = cells.merge(truth, on=["id", "hash"], how="inner")
+    merged["predicted"] = merged["label"].map(LABEL_CODES).fillna(NO_LABEL).astype(np.int64)
+
+    report = {}
+    for service in services:
+        part = merged[merged["service"] == service]
+        if part.empty:
+            report[service] = {"rows": 0}
+            continue
+        matrix = confusion_matrix(part["truth"].to_numpy(), part["predicted"].to_numpy())
+        latency_ms = part["latency"].to_numpy(dtype=float) * 1000
+        report[service] = {
+            "rows": int(len(part)),
+            "errors": int(part["error"].notna().sum()),
+            "accuracy": round(float(np.trace(matrix[:, :len(LABELS)]) / len(part)), 4),
+            "macro_f1": round(macro_f1(matrix), 4),
+            "confusion": {"labels": list(LABELS), "columns": list(LABELS) + ["tanpa_label"], "matrix": matrix.tolist()},
+            "latency_p50_ms": round(float(np.percentile(latency_ms, 50)), 1),
+            "latency_p95_ms": round(float(np.percentile(latency_ms, 95)), 1),
+            "latency_mean_ms": round(float(latency_ms.mean()), 1),
+            "tokens_in": int(part["tokens_in"].sum()),
+            "tokens_out": int(part["tokens_out"].sum()),
+            "cost_usd": round(float(part["cost"].sum()), 6),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'layanan':<10} {'baris':>6} {'error':>6} {'akurasi':>8} {'macroF1':>8} {'p50 ms':>9} {'p95 ms':>9} {'biaya $':>10}")
+    for service, r in report.items():
+        if not r["rows"]:
+            print(f"{service:<10} {0:>6}")
+            continue
+        print(f"{service:<10} {r['rows']:>6} {r['errors']:>6} {r['accuracy']:>8.3f} {r['macro_f1']:>8.3f} "
+              f"{r['latency_p50_ms']:>9} {r['latency_p95_ms']:>9} {r['cost_usd']:>10.4f}")
+    for service, r in report.items():
+        if not r["rows"]:
+            continue
+        print(f"\nConfusion matrix {service} (baris = dataset, kolom = {', '.join(r['confusion']['columns'])}):")
+        for label, row in zip(r["confusion"]["labels"], r["confusion"]["matrix"]):
+            print(f"  {label:<8} " + " ".join(f"{v:>6}" for v in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="File CSV berlabel")
+    parser.add_argument("--services", default=",".join(PBKK_script_api.DEFAULT_SERVICES),
+                        help=f"Layanan yang dievaluasi, dipisah koma (pilihan: {', '.join(PBKK_script_api.AVAILABLE_SERVICES)})")
+    parser.add_argument("--cells", help="File JSONL sel hasil (default: <input>_cells.jsonl)")
+    parser.add_argument("--report", help="Simpan laporan metrik sebagai JSON")
+    parser.add_argument("--text-column", default="text", help="Kolom teks (default: text)")
+    parser.add_argument("--label-column", default="sentiment", help="Kolom label dataset (default: sentiment)")
+    parser.add_argument("--id-column", default=None, help="Kolom id unik (default: nomor baris)")
+    parser.add_argument("--chunksize", type=int, default=1000, help="Jumlah baris CSV yang dibaca sekaligus (default: 1000)")
+    parser.add_argument("--workers", type=int, default=4, help="Jumlah sel yang dihitung bersamaan (default: 4)")
+    parser.add_argument("--timeout", type=float, default=60, help="Batas waktu per request dalam detik (default: 60)")
+    parser.add_argument("--retry-errors", action="store_true", help="Hitung ulang sel yang sebelumnya error")
+    parser.add_argument("--log-level", default=None, help="Level log (default: SENTIMENT_LOG_LEVEL atau INFO)")
+    args = parser.parse_args()
+
+    configure_logging(level=args.log_level)
+    services = [s.strip() for s in args.services.split(",") if s.strip()]
+    unknown = [s for s in services if s not in PBKK_script_api.AVAILABLE_SERVICES]
+    if unknown:
+        parser.error(f"layanan tidak dikenali: {', '.join(unknown)}")
+    cells_path = args.cells or f"{os.path.splitext(args.input)[0]}_cells.jsonl"
+
+    with request_context():
+        report, counts = run_evaluation(
+            args.input, services, cells_path,
+            text_column=args.text_column, label_column=args.label_column, id_column=args.id_column,
+            chunksize=args.chunksize, workers=args.workers, timeout=args.timeout, retry_errors=args.retry_errors,
+        )
+    print(f"Sel baru: {counts['computed']}, dipakai ulang: {counts['reused']} (disimpan di {cells_path})\n")
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nLaporan disimpan ke {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:  # lxml opsional; tanpa lxml semua ekstraksi memakai BeautifulSoup
+    etree = None
+
+# Subtree yang teksnya tidak pernah diambil (sama seperti BeautifulSoup.get_text)
+SKIP_TAGS = frozenset({"script", "style", "template"})
+
+# Ukuran potongan saat HTML diumpankan ke parser
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+class _TextCollector:
+    """Target parser lxml: kumpulkan potongan teks tanpa membangun pohon DOM.
+
+    Teks di dalam tag pada `drop_tags` dibuang langsung saat parsing.
+    Potongan teks dipisah pada setiap batas tag/komentar, sama seperti
+    string-string yang dihasilkan BeautifulSoup.
+    """
+
+    def __init__(self, drop_tags):
+        self.drop_tags = drop_tags
+        self.skip_depth = 0
+        self.pieces = []
+        self._buffer = []
+
+    def _flush(self):
+        if self._buffer:
+            if not self.skip_depth:
+                self.pieces.append("".join(self._buffer))
+            self._buffer = []
+
+    def start(self, tag, attrib):
+        self._flush()
+        if self.skip_depth or tag in self.drop_tags:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        if self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        self._buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self.pieces
+
+
+def fast_extractor_available():
+    return etree is not None
+
+
+def extract_strings_fast(html_text, drop_tags=SKIP_TAGS):
+    """Potongan teks dari HTML memakai parser lxml streaming (tanpa pohon DOM)."""
+    if not html_text or not html_text.strip():
+        return []
+    parser = etree.HTMLParser(target=_TextCollector(drop_tags), remove_comments=False)
+    for i in range(0, len(html_text), FEED_CHUNK_SIZE):
+        parser.feed(html_text[i:i + FEED_CHUNK_SIZE])
+    return parser.close()
+
+
+def extract_strings_bs4(html_text):
+    """Potongan teks dari HTML memakai BeautifulSoup + html.parser (jalur lama)."""
+    soup = BeautifulSoup(html_text, 'html.parser')
+    return list(soup.strings)
+
+
+def get_extractor(extractor=None):
+    """Pilih extractor: argumen, lalu HTML_EXTRACTOR di .env ("fast"/"bs4"), default "fast" jika lxml ada."""
+    extractor = extractor or os.getenv("HTML_EXTRACTOR", "fast")
+    if extractor == "fast" and not fast_extractor_available():
+        return "bs4"
+    return extractor
+
+
+def html_to_text(html_text, separator=' ', strip=True, extractor=None, drop_tags=SKIP_TAGS):
+    """Ubah HTML menjadi teks polos, setara BeautifulSoup.get_text(separator, strip).
+
+    `drop_tags` (hanya untuk extractor "fast") bisa ditambah, misalnya
+    {"nav", "header", "footer"}, untuk membuang navigasi halaman.
+    """
+    if get_extractor(extractor) == "fast":
+        strings = extract_strings_fast(html_text, drop_tags=drop_tags)
+    else:
+        strings = extract_strings_bs4(html_text)
+    if strip:
+        strings = [s.strip() for s in strings]
+        strings = [s for s in strings if s]
+    return separator.join(strings)
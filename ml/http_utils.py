@@ -0,0 +1,207 @@
+import email.utils
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from metrics import observe_http_phases
+from rate_limit import throttle
+
+# Pengaturan dibaca dari .env di CWD atau di folder ml/
+load_dotenv()
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"), override=False)
+
+# Pengaturan transport HTTP (bisa diatur lewat .env)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 16))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 0.5))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 30))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 60))
+
+# Status yang layak dicoba ulang: rate limit & error sementara di server
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Durasi connect (TCP + TLS) yang terjadi di thread ini selama request berjalan
+_connect_time = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_time.value = getattr(_connect_time, "value", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_time.value = getattr(_connect_time, "value", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter yang mencatat lama koneksi baru dibuka (0 jika koneksi keep-alive dipakai ulang)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def get_session(url):
+    """Session dengan connection pool (keep-alive) per host, dibuat sekali per proses."""
+    parts = urlsplit(url)
+    host = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            # Retry ditangani sendiri di request() agar bisa pakai jitter & Retry-After
+            adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+            session.mount(host, adapter)
+            _sessions[host] = session
+        return session
+
+
+def _timeout(timeout):
+    """Ubah timeout menjadi tuple (connect, read).
+
+    None memakai default; angka tunggal dianggap sebagai read timeout.
+    """
+    if timeout is None:
+        return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    if isinstance(timeout, (int, float)):
+        return (min(HTTP_CONNECT_TIMEOUT, timeout), timeout)
+    return timeout
+
+
+def _retry_after(response):
+    """Baca header Retry-After (detik atau tanggal HTTP); None jika tidak ada."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, response=None):
+    """Jeda sebelum percobaan berikutnya: Retry-After jika ada, selain itu
+    exponential backoff dengan full jitter."""
+    retry_after = _retry_after(response)
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method, url, timeout=None, retries=None, provider=None, **kwargs):
+    """Kirim request lewat session yang dipakai bersama, dengan retry.
+
+    Jika `provider` diisi, setiap percobaan melewati rate limiter provider
+    tersebut (lihat rate_limit.py) dan menunggu giliran bila kuota habis.
+
+    Status 429/5xx dan kegagalan koneksi dicoba ulang sampai `retries` kali
+    (default HTTP_MAX_RETRIES). Read timeout tidak dicoba ulang agar worker
+    tidak tertahan berkali-kali oleh model yang lambat. Jika Retry-After
+    meminta menunggu lebih lama dari HTTP_BACKOFF_MAX, respons langsung
+    dikembalikan ke pemanggil.
+
+    Setiap percobaan dicatat ke metrik sentiment_http_phase_seconds:
+    connect (buka koneksi baru), ttfb (sampai header diterima) dan body
+    (membaca isi respons). Body selalu dibaca penuh sebelum dikembalikan,
+    kecuali pemanggil meminta `stream=True`.
+    """
+    retries = HTTP_MAX_RETRIES if retries is None else retries
+    session = get_session(url)
+    timeout = _timeout(timeout)
+    streaming = kwargs.pop("stream", False)
+    label = provider or urlsplit(url).hostname
+
+    for attempt in range(retries + 1):
+        try:
+            with throttle(provider) if provider else nullcontext():
+                _connect_time.value = 0.0
+                start = time.perf_counter()
+                response = session.request(method, url, timeout=timeout, stream=True, **kwargs)
+                headers_at = time.perf_counter()
+                if not streaming:
+                    response.content  # baca body sekarang agar durasinya terukur terpisah dari TTFB
+            connect = _connect_time.value
+            observe_http_phases(label, connect, headers_at - start - connect,
+                                0.0 if streaming else time.perf_counter() - headers_at)
+        except requests.exceptions.ConnectionError:
+            if attempt >= retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        if response.status_code not in RETRY_STATUSES or attempt >= retries:
+            return response
+        delay = backoff_delay(attempt, response)
+        if delay > HTTP_BACKOFF_MAX:
+            return response
+        response.close()
+        time.sleep(delay)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def iter_sse(response):
+    """Baca respons text/event-stream (stream=True) dan hasilkan isi "data" setiap event.
+
+    Baris komentar (diawali ":") seperti keep-alive OpenRouter diabaikan.
+    """
+    data = []
+    for raw in response.iter_lines():
+        line = raw.decode("utf-8")
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data:
+        yield "\n".join(data)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
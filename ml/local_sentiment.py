@@ -0,0 +1,140 @@
+import re
+import threading
+
+import numpy as np
+
+# Leksikon sentimen sederhana (Indonesia + Inggris). Bobot positif/negatif
+# dipakai sebagai model linear di atas jumlah kemunculan kata.
+POSITIVE_WORDS = {
+    # Indonesia
+    "baik": 1.0, "bagus": 1.0, "hebat": 1.2, "senang": 1.0, "sukses": 1.2, "positif": 1.0,
+    "maju": 0.8, "unggul": 1.0, "meningkat": 0.8, "berkembang": 0.8, "berhasil": 1.0,
+    "untung": 0.8, "bahagia": 1.2, "gembira": 1.2, "puas": 1.0, "aman": 0.6, "damai": 1.0,
+    "bantuan": 0.6, "membantu": 0.8, "prestasi": 1.0, "juara": 1.0, "menang": 1.0,
+    "optimis": 1.0, "pulih": 0.8, "tumbuh": 0.6, "sejahtera": 1.2, "mendukung": 0.6,
+    "apresiasi": 0.8, "terbaik": 1.2, "inovasi": 0.6, "peduli": 0.8, "selamat": 0.8,
+    "lancar": 0.6, "naik": 0.4, "menguat": 0.6, "surplus": 0.6, "dukungan": 0.6,
+    # Inggris
+    "good": 1.0, "great": 1.2, "excellent": 1.4, "happy": 1.0, "success": 1.2,
+    "successful": 1.2, "positive": 1.0, "win": 1.0, "wins": 1.0, "won": 1.0, "improve": 0.8,
+    "improved": 0.8, "growth": 0.6, "best": 1.2, "better": 0.8, "help": 0.6, "helped": 0.8,
+    "helps": 0.6, "support": 0.6, "recovery": 0.8, "rescue": 0.8, "rescued": 1.0, "saved": 0.8,
+    "hope": 0.8, "hero": 1.0, "celebrate": 1.0, "love": 1.0, "kind": 0.8, "generous": 1.0,
+    "donated": 0.8, "donation": 0.6, "free": 0.4, "safe": 0.6, "peace": 1.0, "breakthrough": 1.2,
+    "record": 0.4, "boost": 0.6, "thrive": 1.0, "praise": 1.0, "award": 0.8, "wonderful": 1.2,
+}
+
+NEGATIVE_WORDS = {
+    # Indonesia
+    "buruk": 1.0, "jelek": 1.0, "gagal": 1.2, "sedih": 1.0, "negatif": 1.0, "mundur": 0.6,
+    "korupsi": 1.4, "menurun": 0.8, "rugi": 1.0, "bencana": 1.2, "tewas": 1.4, "meninggal": 1.0,
+    "korban": 1.0, "kecelakaan": 1.2, "krisis": 1.2, "konflik": 1.0, "kerusuhan": 1.2,
+    "banjir": 0.8, "kebakaran": 1.0, "penipuan": 1.2, "kriminal": 1.0, "ditangkap": 0.8,
+    "tersangka": 0.8, "penjara": 0.8, "dipenjara": 1.0, "hukuman": 0.6, "ancaman": 1.0,
+    "anjlok": 1.0, "melemah": 0.6, "turun": 0.4, "marah": 1.0, "kecewa": 1.0, "protes": 0.6,
+    "skandal": 1.2, "kekerasan": 1.4, "perang": 1.2, "miskin": 0.8, "defisit": 0.6,
+    # Inggris
+    "bad": 1.0, "worse": 1.0, "worst": 1.2, "fail": 1.2, "failed": 1.2, "failure": 1.2,
+    "sad": 1.0, "negative": 1.0, "corruption": 1.4, "loss": 0.8, "losses": 0.8, "died": 1.2,
+    "dead": 1.2, "death": 1.2, "killed": 1.4, "kill": 1.2, "crisis": 1.2, "conflict": 1.0,
+    "war": 1.2, "attack": 1.2, "crash": 1.0, "fraud": 1.2, "crime": 1.0, "arrested": 0.8,
+    "prison": 0.8, "sentenced": 0.8, "guilty": 1.0, "bribery": 1.4, "threat": 1.0,
+    "violence": 1.4, "scandal": 1.2, "angry": 1.0, "protest": 0.6, "disaster": 1.2,
+    "poverty": 0.8, "decline": 0.8, "injured": 1.0, "victim": 1.0, "victims": 1.0, "abuse": 1.2,
+}
+
+TOKEN_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# |polaritas| di bawah nilai ini dianggap netral
+NEUTRAL_MARGIN = 0.1
+
+
+class LexiconSentimentEngine:
+    """Model sentimen linear berbasis leksikon yang berjalan lokal di CPU.
+
+    Teks diubah menjadi matriks jumlah kata (dokumen x kosakata leksikon),
+    lalu dikalikan dengan vektor bobot sekaligus untuk seluruh batch.
+    """
+
+    def __init__(self, positive=None, negative=None):
+        positive = POSITIVE_WORDS if positive is None else positive
+        negative = NEGATIVE_WORDS if negative is None else negative
+        lexicon = {word: weight for word, weight in positive.items()}
+        for word, weight in negative.items():
+            lexicon[word] = lexicon.get(word, 0.0) - weight
+        self.words = list(lexicon)
+        self.vocab = {word: i for i, word in enumerate(self.words)}
+        self.weights = np.array([lexicon[w] for w in self.words], dtype=np.float32)
+
+    def vectorize(self, texts):
+        """Kembalikan (matriks jumlah kata leksikon, jumlah token per dokumen)."""
+        rows, cols = [], []
+        totals = np.zeros(len(texts), dtype=np.float32)
+        vocab = self.vocab
+        for d, text in enumerate(texts):
+            tokens = TOKEN_RE.findall((text or "").lower())
+            totals[d] = len(tokens)
+            for token in tokens:
+                idx = vocab.get(token)
+                if idx is not None:
+                    rows.append(d)
+                    cols.append(idx)
+        counts = np.zeros((len(texts), len(self.words)), dtype=np.float32)
+        if rows:
+            np.add.at(counts, (np.array(rows), np.array(cols)), 1.0)
+        return counts, totals
+
+    def score_many(self, texts, top_k=5):
+        """Skor sentimen untuk banyak teks sekaligus; satu dict hasil per teks."""
+        counts, totals = self.vectorize(texts)
+        contributions = counts * self.weights
+        raw = contributions.sum(axis=1)
+        # Normalisasi terhadap panjang dokumen agar teks panjang tidak selalu ekstrem
+        polarity = np.tanh(raw / np.sqrt(np.maximum(totals, 1.0)))
+
+        results = []
+        for d in range(len(texts)):
+            p = float(polarity[d])
+            if p > NEUTRAL_MARGIN:
+                label, score = "positif", abs(p)
+            elif p < -NEUTRAL_MARGIN:
+                label, score = "negatif", abs(p)
+            else:
+                label, score = "netral", 1.0 - abs(p)
+            nonzero = np.nonzero(counts[d])[0]
+            ranked = nonzero[np.argsort(-np.abs(contributions[d, nonzero]))][:top_k]
+            results.append({
+                "label": label,
+                "score": round(score, 4),
+                "polarity": round(p, 4),
+                "highlights": [self.words[i] for i in ranked],
+                "_provider": "local",
+            })
+        return results
+
+    def score(self, text):
+        return self.score_many([text])[0]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Engine lokal dimuat sekali per proses."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = LexiconSentimentEngine()
+    return _engine
+
+
+def analyze_local(text):
+    """Analisis satu teks dengan engine lokal."""
+    return get_engine().score(text)
+
+
+def analyze_local_many(texts):
+    """Analisis banyak teks sekaligus dengan engine lokal (tervektorisasi)."""
+    return get_engine().score_many(list(texts))
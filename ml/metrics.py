@@ -0,0 +1,299 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Batas bucket histogram (detik), cukup lebar untuk parsing HTML (ms) sampai model yang "tidur" (puluhan detik)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("metrics")
+
+# ID request yang sedang diproses; ikut tercatat di setiap baris log
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    """Counter Prometheus dengan label bebas, aman dipakai dari banyak thread."""
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Histogram Prometheus (bucket kumulatif, _sum dan _count) per kombinasi label."""
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self, **labels):
+        """Salinan {"sum", "count"} untuk satu kombinasi label (0 jika belum ada)."""
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return {"sum": series["sum"], "count": series["count"]} if series else {"sum": 0.0, "count": 0}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', f'{bound:g}')])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """Kumpulan metrik satu proses; render() menghasilkan format teks Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            return metric
+
+    def counter(self, name, documentation):
+        return self._get_or_create(Counter, name, documentation)
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "sentiment_stage_duration_seconds", "Durasi setiap tahap pipeline analisis (detik)")
+STAGE_TOTAL = REGISTRY.counter(
+    "sentiment_stage_total", "Jumlah eksekusi setiap tahap pipeline per status")
+HTTP_PHASE_SECONDS = REGISTRY.histogram(
+    "sentiment_http_phase_seconds", "Durasi fase request HTTP ke provider: connect, ttfb, body (detik)")
+
+
+def render_prometheus():
+    """Semua metrik proses ini dalam format teks Prometheus (untuk endpoint /metrics atau file)."""
+    return REGISTRY.render()
+
+
+def write_prometheus(path):
+    """Tulis metrik ke file (cocok untuk textfile collector node_exporter)."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+
+
+# ============================
+# Request ID
+# ============================
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id=None):
+    """Tandai semua log & tahap di dalam blok dengan satu request ID.
+
+    Thread baru tidak mewarisi ID ini secara otomatis; kirim fungsi lewat
+    contextvars.copy_context().run agar ID ikut ke worker thread.
+    """
+    token = _request_id.set(request_id or new_request_id())
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+
+# ============================
+# Tahap pipeline
+# ============================
+class _Stage:
+    """Objek yang diberikan `with stage(...) as s`; set s.status = "error" untuk kegagalan tanpa exception."""
+
+    def __init__(self):
+        self.status = "ok"
+
+
+@contextmanager
+def stage(name, **labels):
+    """Ukur satu tahap pipeline: histogram durasi, counter per status, dan log DEBUG.
+
+    Bisa dipakai sebagai context manager maupun decorator:
+
+        with stage("ocr") as s:
+            ...
+            if not text:
+                s.status = "error"
+
+        @stage("html_clean")
+        def clean_html_text(...): ...
+
+    Exception yang lolos dari blok dicatat dengan status "error" lalu dilempar ulang.
+    """
+    current = _Stage()
+    start = time.perf_counter()
+    try:
+        yield current
+    except GeneratorExit:
+        # Generator (misalnya stream) dihentikan pemanggil: bukan kegagalan
+        raise
+    except BaseException:
+        current.status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name, **labels)
+        STAGE_TOTAL.inc(stage=name, status=current.status, **labels)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("tahap %s selesai dalam %.4f detik", name, elapsed,
+                         extra={"fields": {"stage": name, "status": current.status,
+                                           "duration": round(elapsed, 6), **labels}})
+
+
+def observe_stage(name, seconds, **labels):
+    """Catat durasi tahap yang diukur sendiri (misalnya waktu sampai label muncul pada streaming)."""
+    STAGE_SECONDS.observe(seconds, stage=name, **labels)
+    STAGE_TOTAL.inc(stage=name, status="ok", **labels)
+
+
+def observe_http_phases(provider, connect, ttfb, body):
+    """Catat durasi connect / time-to-first-byte / body satu request HTTP."""
+    for phase, value in (("connect", connect), ("ttfb", ttfb), ("body", body)):
+        HTTP_PHASE_SECONDS.observe(max(0.0, value), provider=provider, phase=phase)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("http %s connect=%.4f ttfb=%.4f body=%.4f", provider, connect, ttfb, body,
+                     extra={"fields": {"provider": provider, "connect": round(connect, 6),
+                                       "ttfb": round(ttfb, 6), "body": round(body, 6)}})
+
+
+# ============================
+# Logging
+# ============================
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Satu baris JSON per log: waktu, level, logger, pesan, request_id dan field tambahan."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(level=None, json_logs=None, stream=None):
+    """Atur logging untuk CLI (stderr).
+
+    `level` default SENTIMENT_LOG_LEVEL (INFO); `json_logs` default
+    SENTIMENT_LOG_JSON. Pada level WARNING ke atas pesan progres tidak
+    ditulis sama sekali sehingga batch besar tidak terhambat I/O terminal.
+    """
+    level = level or os.getenv("SENTIMENT_LOG_LEVEL", "INFO")
+    if json_logs is None:
+        json_logs = os.getenv("SENTIMENT_LOG_JSON", "0").lower() in ("1", "true", "yes", "on")
+
+    handler = logging.StreamHandler(stream)
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(JsonFormatter() if json_logs else logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    # Log koneksi urllib3 terlalu ramai untuk level DEBUG pipeline
+    logging.getLogger("urllib3").setLevel(max(logging.WARNING, root.level))
+    return handler
@@ -0,0 +1,202 @@
+"""Deteksi teks hampir sama (MinHash + LSH) agar berita sindikasi tidak dianalisis ulang.
+
+Teks dinormalisasi (NFKC, huruf kecil, hanya kata) dan dipecah menjadi
+shingle 3 kata. Signature MinHash (64 permutasi) memperkirakan kemiripan
+Jaccard antar himpunan shingle; dua teks dianggap hampir sama jika
+perkiraannya >= `threshold` (default 0.8). Sisipan "Baca juga", kredit
+kantor berita atau sedikit kata yang berubah tetap di atas ambang, artikel
+berbeda jauh di bawahnya.
+
+Indeks LSH: signature dibagi 16 band x 4 baris, tiap band di-hash menjadi satu
+kunci dan disimpan di SQLite (terindeks). Pencarian hanya membaca dokumen yang
+berbagi minimal satu band, sehingga tetap di bawah 1 ms meskipun indeks berisi
+jutaan entri. Jumlah dokumen dibatasi (`max_entries`, LRU).
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from cache_utils import get_cache_dir
+
+WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+SHINGLE_SIZE = 3
+# Teks pendek tidak punya cukup shingle untuk perkiraan yang stabil; tidak diindeks
+MIN_WORDS = 30
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# Seed tetap: signature harus sama antar proses agar indeks di disk tetap berlaku
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+def minhash(text):
+    """Signature MinHash (np.uint32[NUM_PERM]) dari `text`, atau None jika teks terlalu pendek."""
+    words = WORD_RE.findall(unicodedata.normalize("NFKC", text or "").lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest() for s in shingles)
+    values = np.frombuffer(digests, dtype="<u4").astype(np.uint64)
+    # Permutasi (a*x + b) mod p untuk semua shingle sekaligus; overflow uint64 disengaja
+    with np.errstate(over="ignore"):
+        permuted = ((values[:, None] * _PERM_A + _PERM_B) % _MERSENNE) & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def similarity(signature_a, signature_b):
+    """Perkiraan kemiripan Jaccard dari dua signature MinHash."""
+    return float(np.count_nonzero(signature_a == signature_b)) / NUM_PERM
+
+
+def band_keys(signature, scope):
+    """Satu kunci int64 per band; `scope` ikut di-hash sehingga scope berbeda tidak saling bertemu."""
+    prefix = scope.encode("utf-8") + b"\x1f"
+    return [
+        int.from_bytes(
+            hashlib.blake2b(prefix + bytes([i]) + signature[i * ROWS:(i + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            "big", signed=True,
+        )
+        for i in range(BANDS)
+    ]
+
+
+class NearDuplicateIndex:
+    """Indeks MinHash persisten: signature -> kunci cache hasil analisis teks aslinya.
+
+    Entri dikelompokkan per `scope` (misalnya layanan + prompt) sehingga hasil
+    mode atau provider lain tidak tertukar. Aman dipakai dari banyak thread.
+    """
+
+    def __init__(self, path, threshold=0.8, max_entries=1_000_000):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " id INTEGER PRIMARY KEY,"
+            " cache_key TEXT NOT NULL UNIQUE,"
+            " signature BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bands ("
+            " band_key INTEGER NOT NULL,"
+            " doc_id INTEGER NOT NULL,"
+            " PRIMARY KEY (band_key, doc_id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_doc ON bands(doc_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_last_access ON docs(last_access)")
+        # Jumlah dokumen dilacak di memori agar penambahan tidak perlu COUNT(*) atas jutaan baris
+        self._count = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        self._candidates_sql = (
+            "SELECT DISTINCT d.id, d.cache_key, d.signature FROM bands b JOIN docs d ON d.id = b.doc_id"
+            f" WHERE b.band_key IN ({', '.join('?' * BANDS)})"
+        )
+
+    def lookup(self, signature, scope):
+        """Entri paling mirip dengan kemiripan >= threshold: {"id", "cache_key", "similarity"}, atau None."""
+        keys = band_keys(signature, scope)
+        with self._lock:
+            best = None
+            for doc_id, cache_key, blob in self._conn.execute(self._candidates_sql, keys):
+                score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+                if score >= self.threshold and (best is None or score > best["similarity"]):
+                    best = {"id": doc_id, "cache_key": cache_key, "similarity": round(score, 4)}
+            if best is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE docs SET last_access = ? WHERE id = ?", (time.time(), best["id"]))
+            self.hits += 1
+        return best
+
+    def add(self, signature, scope, cache_key):
+        now = time.time()
+        with self._lock:
+            if self._conn.execute("UPDATE docs SET last_access = ? WHERE cache_key = ?", (now, cache_key)).rowcount:
+                return
+            self._conn.execute("BEGIN")
+            try:
+                doc_id = self._conn.execute(
+                    "INSERT INTO docs (cache_key, signature, last_access) VALUES (?, ?, ?)",
+                    (cache_key, signature.astype(np.uint32).tobytes(), now),
+                ).lastrowid
+                self._conn.executemany("INSERT OR IGNORE INTO bands (band_key, doc_id) VALUES (?, ?)",
+                                       [(key, doc_id) for key in band_keys(signature, scope)])
+                self._count += 1
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._count = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+                raise
+
+    def _evict(self):
+        if not self.max_entries or self._count <= self.max_entries:
+            return
+        # Buang sekaligus ~1% dokumen tertua agar eviksi tidak terjadi di setiap penambahan
+        excess = self._count - self.max_entries + max(1, self.max_entries // 100)
+        ids = [(row[0],) for row in self._conn.execute(
+            "SELECT id FROM docs ORDER BY last_access LIMIT ?", (excess,))]
+        self._delete(ids)
+        self.evictions += len(ids)
+
+    def _delete(self, ids):
+        self._conn.executemany("DELETE FROM bands WHERE doc_id = ?", ids)
+        self._conn.executemany("DELETE FROM docs WHERE id = ?", ids)
+        self._count -= len(ids)
+
+    def remove(self, doc_id):
+        """Hapus satu dokumen (misalnya karena hasil aslinya sudah hilang dari cache)."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM docs WHERE id = ?", (doc_id,)).fetchone():
+                self._delete([(doc_id,)])
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM bands")
+            self._conn.execute("DELETE FROM docs")
+            self._count = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self._count,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(threshold=0.8, max_entries=1_000_000):
+    """Indeks bersama di folder cache (ml/.cache/near_duplicates.sqlite). Satu instance per proses."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex(os.path.join(get_cache_dir(), "near_duplicates.sqlite"),
+                                        threshold=threshold, max_entries=max_entries)
+        return _index
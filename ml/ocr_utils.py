@@ -1,50 +1,115 @@
 import requests
+import hashlib
+import logging
 import os
+import threading
 from dotenv import load_dotenv
+from cache_utils import cache_enabled, get_cache, make_key
+import http_utils
+from metrics import stage
+
+logger = logging.getLogger(__name__)
 
 # Load API key dari file .env
 load_dotenv()
 API_KEY_OCR = os.getenv("API_KEY_OCR")
-ENDPOINT_OCR = "https://api.ocr.space/parse/image"
+ENDPOINT_OCR = os.getenv("ENDPOINT_OCR", "https://api.ocr.space/parse/image")
+OCR_LANGUAGE = "eng"
+OCR_ENGINE = 2
+
+# Cache hasil OCR berdasarkan SHA-256 isi gambar + bahasa + engine
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", 5000))
+
+# Counter penghematan kuota OCR (upload yang tidak perlu dikirim)
+_ocr_counters = {"uploads": 0, "uploads_saved": 0, "bytes_saved": 0}
+_ocr_counters_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _ocr_counters_lock:
+        _ocr_counters[name] += amount
+
+
+def get_ocr_cache():
+    return get_cache("ocr", ttl=None, max_entries=OCR_CACHE_MAX_ENTRIES)
+
 
-def extract_text_from_image(image_path):
+def ocr_cache_key(image_bytes, language=OCR_LANGUAGE, engine=OCR_ENGINE):
+    """Kunci cache OCR: SHA-256 isi gambar + pengaturan bahasa & engine."""
+    return make_key(hashlib.sha256(image_bytes).hexdigest(), language, engine)
+
+
+def get_ocr_cache_stats():
+    """Statistik cache OCR digabung dengan counter upload yang dihemat."""
+    with _ocr_counters_lock:
+        stats = dict(_ocr_counters)
+    stats.update(get_ocr_cache().stats())
+    return stats
+
+
+def extract_text_from_image(image_path, use_cache=True):
     """
     Mengekstraksi teks dari gambar menggunakan OCR.Space API.
     Mendukung format JPG, JPEG, dan PNG.
+    Gambar yang sama (isi byte identik) diambil dari cache tanpa upload ulang.
+    Durasi tercatat sebagai tahap "ocr" (lihat metrics.py).
     """
+    with stage("ocr") as ocr_stage:
+        text = _extract_text_from_image(image_path, use_cache)
+        if not text:
+            ocr_stage.status = "error"
+    return text
+
+
+def _extract_text_from_image(image_path, use_cache):
     if not API_KEY_OCR:
-        print("Error: API_KEY_OCR tidak ditemukan di .env")
+        logger.warning("Error: API_KEY_OCR tidak ditemukan di .env")
         return None
 
     try:
         with open(image_path, 'rb') as image_file:
-            response = requests.post(
-                ENDPOINT_OCR,
-                files={"file": image_file},
-                data={
-                    "apikey": API_KEY_OCR,
-                    "language": "eng",
-                    "OCREngine": 2
-                }
-            )
+            image_bytes = image_file.read()
+
+        use_cache = use_cache and cache_enabled()
+        if use_cache:
+            cache_key = ocr_cache_key(image_bytes)
+            cached = get_ocr_cache().get(cache_key)
+            if cached is not None:
+                _count("uploads_saved")
+                _count("bytes_saved", len(image_bytes))
+                return cached
+
+        _count("uploads")
+        response = http_utils.post(
+            ENDPOINT_OCR,
+            files={"file": (os.path.basename(image_path), image_bytes)},
+            data={
+                "apikey": API_KEY_OCR,
+                "language": OCR_LANGUAGE,
+                "OCREngine": OCR_ENGINE
+            },
+            provider="ocr"
+        )
         response.raise_for_status()
         result = response.json()
 
         if result.get("IsErroredOnProcessing"):
-            print("Error OCR:", result.get("ErrorMessage"))
+            logger.warning("Error OCR: %s", result.get("ErrorMessage"))
             return None
 
         parsed_results = result.get("ParsedResults")
         if not parsed_results or not parsed_results[0].get("ParsedText"):
-            print("Tidak ada teks yang terdeteksi dari gambar.")
+            logger.warning("Tidak ada teks yang terdeteksi dari gambar.")
             return None
 
-        parsed_text = parsed_results[0]["ParsedText"]
-        return parsed_text.strip()
+        parsed_text = parsed_results[0]["ParsedText"].strip()
+        if use_cache:
+            get_ocr_cache().set(cache_key, parsed_text)
+        return parsed_text
 
     except FileNotFoundError:
-        print(f"Error: File {image_path} tidak ditemukan.")
+        logger.warning(f"Error: File {image_path} tidak ditemukan.")
         return None
     except requests.exceptions.RequestException as e:
-        print(f"Error saat memanggil API OCR: {e}")
+        logger.warning(f"Error saat memanggil API OCR: {e}")
         return None
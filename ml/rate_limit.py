@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Konfigurasi per provider lewat .env (NAMA = GEMINI, DEEPSEEK, BERT, OCR, ...):
+#   RATE_LIMIT_<NAMA>    request per detik (0 = tanpa batas)
+#   RATE_BURST_<NAMA>    jumlah request yang boleh dikirim beruntun (default: 1 atau rate)
+#   MAX_IN_FLIGHT_<NAMA> jumlah request yang boleh berjalan bersamaan
+DEFAULT_RATE_LIMIT = 0.0
+DEFAULT_MAX_IN_FLIGHT = 8
+
+
+class TokenBucket:
+    """Token bucket sederhana; acquire() menunggu sampai token tersedia."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class ProviderLimiter:
+    """Gabungan rate limit (token bucket) dan batas request bersamaan untuk satu provider.
+
+    Pemanggil menunggu (bukan gagal) jika kuota habis. Statistik antrian dan
+    waktu tunggu tersedia lewat stats().
+    """
+
+    def __init__(self, name, rate=DEFAULT_RATE_LIMIT, burst=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.name = name
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self.bucket = TokenBucket(rate, burst if burst is not None else max(1.0, rate))
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @contextmanager
+    def acquire(self):
+        start = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.waiting)
+        try:
+            self._slots.acquire()
+            try:
+                self.bucket.acquire()
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._lock:
+                self.waiting -= 1
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        try:
+            yield waited
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate_limit": self.rate,
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "total_wait": round(self.total_wait, 4),
+                "avg_wait": round(self.total_wait / self.calls, 4) if self.calls else 0.0,
+                "max_wait": round(self.max_wait, 4),
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider):
+    """Limiter untuk `provider`, dibuat sekali per proses dari variabel .env."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            name = provider.upper()
+            rate = float(os.getenv(f"RATE_LIMIT_{name}", DEFAULT_RATE_LIMIT))
+            burst = os.getenv(f"RATE_BURST_{name}")
+            max_in_flight = int(os.getenv(f"MAX_IN_FLIGHT_{name}", DEFAULT_MAX_IN_FLIGHT))
+            limiter = ProviderLimiter(provider, rate=rate, burst=float(burst) if burst else None,
+                                      max_in_flight=max_in_flight)
+            _limiters[provider] = limiter
+        return limiter
+
+
+def throttle(provider):
+    """Context manager: tunggu giliran sebelum memanggil `provider`.
+
+    Contoh:
+        with throttle("gemini"):
+            response = session.post(...)
+    """
+    return get_limiter(provider).acquire()
+
+
+def get_limiter_stats():
+    """Statistik semua limiter yang sudah dipakai, per provider."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
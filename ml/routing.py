@@ -0,0 +1,182 @@
+"""Statistik latensi/error per provider dan circuit breaker untuk mode routing.
+
+Setiap panggilan provider di analyze_text_directly dicatat sekali (durasi dan
+apakah hasilnya bisa dipakai). Dari jendela sampel terakhir dihitung p50/p95
+dan error rate; analyze_routed memakainya untuk memilih urutan provider dan
+menentukan kapan request duplikat (hedge) dikirim. Kegagalan beruntun membuka
+circuit breaker sehingga provider yang mati atau "tidur" tidak menahan worker.
+
+Konfigurasi lewat .env (NAMA = GEMINI, DEEPSEEK, BERT):
+    ROUTE_WINDOW               jumlah request terakhir yang dipakai untuk latensi & error rate
+    ROUTE_MIN_SAMPLES          minimal sampel sebelum p95 dipakai sebagai jeda hedge
+    ROUTE_HEDGE_DELAY          jeda hedge (detik) selama sampel belum cukup
+    BREAKER_FAILURES_<NAMA>    jumlah gagal beruntun sebelum circuit breaker terbuka
+    BREAKER_COOLDOWN_<NAMA>    lama (detik) breaker terbuka sebelum satu request percobaan diizinkan
+    SENTIMENT_CIRCUIT_BREAKER  0 = breaker tidak pernah menahan request (statistik tetap dicatat)
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+
+ROUTE_WINDOW = int(os.getenv("ROUTE_WINDOW", 100))
+ROUTE_MIN_SAMPLES = int(os.getenv("ROUTE_MIN_SAMPLES", 5))
+ROUTE_HEDGE_DELAY = float(os.getenv("ROUTE_HEDGE_DELAY", 2.0))
+ROUTE_HEDGE_MIN = 0.05
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_COOLDOWN = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_TRANSITIONS = REGISTRY.counter(
+    "sentiment_circuit_transitions_total", "Perubahan status circuit breaker per provider")
+HEDGED_REQUESTS = REGISTRY.counter(
+    "sentiment_hedged_requests_total", "Request duplikat yang dikirim karena provider melewati p95 latensinya")
+
+
+def breaker_enabled():
+    return os.getenv("SENTIMENT_CIRCUIT_BREAKER", "1").lower() not in ("0", "false", "no", "off")
+
+
+class ProviderHealth:
+    """Latensi & error rate bergulir satu provider, beserta circuit breaker-nya.
+
+    closed    -> request berjalan normal; `failure_threshold` kegagalan beruntun membuka breaker
+    open      -> request ditolak selama `cooldown` detik
+    half_open -> satu request percobaan diizinkan; berhasil menutup breaker, gagal membukanya lagi
+    """
+
+    def __init__(self, name, window=ROUTE_WINDOW, failure_threshold=DEFAULT_BREAKER_FAILURES,
+                 cooldown=DEFAULT_BREAKER_COOLDOWN):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.rejected = 0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        self.state = state
+        BREAKER_TRANSITIONS.inc(provider=self.name, state=state)
+
+    def allow(self):
+        """True jika request boleh dikirim sekarang (selalu True jika breaker dimatikan)."""
+        if not breaker_enabled():
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.cooldown:
+                self._transition(HALF_OPEN)
+                self.probe_started = None
+            if self.state == HALF_OPEN:
+                # Percobaan yang tidak pernah melapor (misalnya thread dibatalkan) tidak menahan selamanya
+                if self.probe_started is None or now - self.probe_started >= self.cooldown:
+                    self.probe_started = now
+                    return True
+            elif self.state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, latency, ok):
+        """Catat satu request selesai: durasi (detik) dan berhasil/tidak."""
+        with self._lock:
+            self._samples.append((latency, ok))
+            if ok:
+                self.consecutive_failures = 0
+                if self.state != CLOSED:
+                    # Pulih: mulai jendela baru agar error lama tidak terus menurunkan peringkatnya
+                    self._samples.clear()
+                    self._samples.append((latency, ok))
+                    self._transition(CLOSED)
+                return
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                    self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def percentile(self, q):
+        """Latensi persentil `q` (0-1) dari jendela sampel, atau None jika sampel belum cukup."""
+        with self._lock:
+            latencies = sorted(latency for latency, _ in self._samples)
+        if len(latencies) < ROUTE_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def error_rate(self):
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def hedge_delay(self):
+        """Berapa lama menunggu provider ini sebelum mengirim duplikat ke provider lain: p95 latensinya."""
+        p95 = self.percentile(0.95)
+        return ROUTE_HEDGE_DELAY if p95 is None else max(ROUTE_HEDGE_MIN, p95)
+
+    def cost(self, timeout):
+        """Perkiraan waktu sampai jawaban berhasil: p50 + error rate x `timeout` (0 jika belum ada data)."""
+        p50 = self.percentile(0.5)
+        return (p50 or 0.0) + self.error_rate() * timeout
+
+    def stats(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self._lock:
+            samples = len(self._samples)
+            state, failures, rejected = self.state, self.consecutive_failures, self.rejected
+        return {
+            "state": state,
+            "samples": samples,
+            "error_rate": round(self.error_rate(), 4),
+            "p50": None if p50 is None else round(p50, 3),
+            "p95": None if p95 is None else round(p95, 3),
+            "consecutive_failures": failures,
+            "rejected": rejected,
+        }
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_health(provider):
+    """Statistik & breaker untuk `provider`, dibuat sekali per proses dari variabel .env."""
+    with _health_lock:
+        health = _health.get(provider)
+        if health is None:
+            name = provider.upper()
+            health = ProviderHealth(
+                provider,
+                failure_threshold=int(os.getenv(f"BREAKER_FAILURES_{name}", DEFAULT_BREAKER_FAILURES)),
+                cooldown=float(os.getenv(f"BREAKER_COOLDOWN_{name}", DEFAULT_BREAKER_COOLDOWN)),
+            )
+            _health[provider] = health
+        return health
+
+
+def rank_providers(providers, timeout=60):
+    """Urutkan provider untuk mode routing: breaker tertutup dulu, lalu perkiraan waktu tercepat.
+
+    Provider dengan breaker terbuka tetap disertakan di akhir: dicoba hanya jika yang lain gagal
+    (dan tetap ditolak oleh allow() selama cooldown). Urutan asli dipakai jika nilainya sama.
+    """
+    def key(provider):
+        health = get_health(provider)
+        return (health.state != CLOSED, health.cost(timeout))
+    return sorted(providers, key=key)
+
+
+def get_health_stats():
+    """Statistik semua provider yang sudah tercatat."""
+    with _health_lock:
+        health = dict(_health)
+    return {name: h.stats() for name, h in health.items()}
@@ -5,8 +5,8 @@
 import requests
 import json
 import os
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+from html_extract import html_to_text
 
 # Load API key
 load_dotenv()
@@ -22,8 +22,7 @@ API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-fl
 
 def clean_html_text(html_text):
     """Fungsi untuk menghapus tag HTML dari teks."""
-    soup = BeautifulSoup(html_text, 'html.parser')
-    return soup.get_text(separator=' ', strip=True)
+    return html_to_text(html_text, separator=' ', strip=True)
 
 def analyze_news_from_html(file_path):
     """
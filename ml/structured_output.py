@@ -0,0 +1,116 @@
+"""Jawaban ringkas terstruktur (JSON schema) untuk Gemini dan OpenRouter.
+
+Provider diminta menjawab JSON {label, score, highlights} yang dibatasi schema
+dan jumlah token output, lalu jawabannya diurai langsung menjadi
+SentimentResult. Jawaban yang tidak sesuai schema dianggap gagal (tanpa
+menebak label dari teks bebas).
+"""
+import json
+import os
+from dataclasses import dataclass, field
+
+LABELS = ("positif", "negatif", "netral")
+
+# Batas token jawaban; JSON label + skor + beberapa kata kunci jauh di bawah angka ini
+MAX_OUTPUT_TOKENS = int(os.getenv("SENTIMENT_MAX_OUTPUT_TOKENS", 128))
+MAX_HIGHLIGHTS = 5
+
+# JSON Schema standar (OpenRouter response_format, mode strict)
+SENTIMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "label": {"type": "string", "enum": list(LABELS)},
+        "score": {"type": "number"},
+        "highlights": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["label", "score", "highlights"],
+    "additionalProperties": False,
+}
+
+# Gemini memakai subset OpenAPI: nama tipe huruf besar dan tanpa additionalProperties
+GEMINI_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "label": {"type": "STRING", "enum": list(LABELS)},
+        "score": {"type": "NUMBER"},
+        "highlights": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["label", "score", "highlights"],
+    "propertyOrdering": ["label", "score", "highlights"],
+}
+
+
+class StructuredOutputError(ValueError):
+    """Jawaban provider tidak sesuai schema jawaban ringkas."""
+
+
+@dataclass
+class SentimentResult:
+    label: str
+    score: float
+    highlights: list = field(default_factory=list)
+    provider: str = ""
+
+    @classmethod
+    def from_json(cls, data, provider):
+        """Validasi dict hasil json.loads dan ubah menjadi SentimentResult."""
+        if not isinstance(data, dict):
+            raise StructuredOutputError(f"jawaban bukan objek JSON: {type(data).__name__}")
+        label = data.get("label")
+        if not isinstance(label, str) or label.lower() not in LABELS:
+            raise StructuredOutputError(f"label tidak valid: {label!r}")
+        score = data.get("score")
+        if isinstance(score, bool) or not isinstance(score, (int, float)):
+            raise StructuredOutputError(f"score bukan angka: {score!r}")
+        highlights = data.get("highlights") or []
+        if not isinstance(highlights, list) or not all(isinstance(h, str) for h in highlights):
+            raise StructuredOutputError(f"highlights bukan list string: {highlights!r}")
+        return cls(
+            label=label.lower(),
+            score=round(min(1.0, max(0.0, float(score))), 4),
+            highlights=highlights[:MAX_HIGHLIGHTS],
+            provider=provider,
+        )
+
+    def to_dict(self):
+        """Bentuk dict untuk cache dan pipeline; "_structured" berisi nama provider."""
+        return {"label": self.label, "score": self.score, "highlights": list(self.highlights),
+                "_structured": self.provider}
+
+
+def gemini_generation_config(max_output_tokens=None):
+    return {
+        "responseMimeType": "application/json",
+        "responseSchema": GEMINI_SCHEMA,
+        "maxOutputTokens": max_output_tokens or MAX_OUTPUT_TOKENS,
+        "temperature": 0,
+    }
+
+
+def openrouter_response_format():
+    return {"type": "json_schema", "json_schema": {"name": "sentiment", "strict": True, "schema": SENTIMENT_SCHEMA}}
+
+
+def _response_text(api_service, response):
+    """Teks jawaban model dan alasan berhenti dari respons Gemini / OpenRouter."""
+    try:
+        if api_service == "gemini":
+            candidate = response["candidates"][0]
+            return candidate["content"]["parts"][0]["text"], candidate.get("finishReason")
+        choice = response["choices"][0]
+        return choice["message"]["content"], choice.get("finish_reason")
+    except (KeyError, IndexError, TypeError) as e:
+        raise StructuredOutputError(f"bentuk respons {api_service} tidak dikenali ({e!r})") from e
+
+
+def parse_response(api_service, response):
+    """Ubah respons JSON provider (mode ringkas) menjadi SentimentResult.
+
+    Melempar StructuredOutputError jika jawaban terpotong atau tidak sesuai schema.
+    """
+    text, finish = _response_text(api_service, response)
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise StructuredOutputError(f"jawaban bukan JSON valid (finish: {finish}): {e}") from e
+    return SentimentResult.from_json(data, api_service)
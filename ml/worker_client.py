@@ -0,0 +1,139 @@
+"""Klien ringan untuk worker analisis (analysis_server.py).
+
+Hanya memakai library standar sehingga start-up cepat; semua pekerjaan berat
+dilakukan di worker yang sudah berjalan.
+
+Contoh:
+    python worker_client.py compare berita.html --services gemini,bert
+    python worker_client.py analyze --text "Harga beras turun" --service local
+    python worker_client.py analyze berita.html --service gemini --stream
+    python worker_client.py analyze berita.html --routed
+    python worker_client.py url https://contoh.com/berita --service gemini
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+DEFAULT_WORKER_URL = os.getenv("ML_WORKER_URL", "http://127.0.0.1:8765")
+
+
+class WorkerError(Exception):
+    pass
+
+
+def _open(endpoint, payload, worker_url=None, timeout=120, request_id=None):
+    url = (worker_url or DEFAULT_WORKER_URL).rstrip("/") + endpoint
+    headers = {"Content-Type": "application/json"}
+    if request_id:
+        headers["X-Request-ID"] = request_id
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), headers=headers, method="POST")
+    try:
+        return urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        try:
+            detail = json.loads(e.read().decode("utf-8")).get("_error")
+        except ValueError:
+            detail = None
+        raise WorkerError(f"Worker membalas {e.code}: {detail or e.reason}") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise WorkerError(f"Worker di {url} tidak bisa dihubungi: {e}") from e
+
+
+def call_worker(endpoint, payload, worker_url=None, timeout=120, request_id=None):
+    """POST `payload` (dict) ke endpoint worker dan kembalikan respons JSON-nya.
+
+    Melempar WorkerError jika worker tidak bisa dihubungi atau membalas
+    status selain 200 (misalnya 503 saat antrian penuh).
+    """
+    with _open(endpoint, payload, worker_url, timeout, request_id) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def _source(file_path=None, text=None):
+    # Path absolut agar worker (dengan CWD berbeda) menemukan file yang sama
+    return {"text": text} if text else {"file": os.path.abspath(file_path)}
+
+
+def analyze(file_path=None, text=None, service="gemini", timeout=60, verbose=False, routed=False, worker_url=None):
+    payload = {**_source(file_path, text), "service": service, "timeout": timeout, "verbose": verbose,
+               "routed": routed}
+    # Mode routing bisa menunggu provider kedua (hedge / ganti provider) setelah yang pertama
+    return call_worker("/analyze", payload, worker_url=worker_url, timeout=timeout * (2 if routed else 1) + 10)
+
+
+def stream_analyze(file_path=None, text=None, service="gemini", timeout=60, worker_url=None):
+    """Generator event streaming dari worker: delta, label, error, final (lihat stream_analyze_text)."""
+    payload = {**_source(file_path, text), "service": service, "timeout": timeout, "stream": True}
+    with _open("/analyze", payload, worker_url, timeout + 10) as response:
+        data = []
+        for raw in response:
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if line.startswith("data:"):
+                data.append(line[5:].lstrip())
+            elif not line and data:
+                yield json.loads("\n".join(data))
+                data = []
+
+
+def compare(file_path=None, text=None, services=None, concurrent=True, timeout=60, deadline=None, verbose=False,
+            routed=False, worker_url=None):
+    payload = {**_source(file_path, text), "concurrent": concurrent, "timeout": timeout, "deadline": deadline,
+               "verbose": verbose, "routed": routed}
+    if services:
+        payload["services"] = list(services)
+    return call_worker("/compare", payload, worker_url=worker_url, timeout=(deadline or timeout) * 3 + 10)
+
+
+def analyze_url(url, service="gemini", timeout=120, worker_url=None):
+    return call_worker("/analyze_url", {"url": url, "service": service}, worker_url=worker_url, timeout=timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["analyze", "compare", "url"])
+    parser.add_argument("target", nargs="?", help="Path file (analyze/compare) atau URL (url)")
+    parser.add_argument("--text", help="Analisis teks ini, bukan file")
+    parser.add_argument("--service", default="gemini", help="Layanan untuk analyze/url (default: gemini)")
+    parser.add_argument("--services", default=None, help="Layanan untuk compare, dipisah koma")
+    parser.add_argument("--timeout", type=float, default=60, help="Batas waktu per layanan dalam detik (default: 60)")
+    parser.add_argument("--stream", action="store_true", help="analyze: tampilkan jawaban bertahap dari worker")
+    parser.add_argument("--verbose", action="store_true", help="Minta alasan lengkap dari Gemini/DeepSeek, bukan JSON ringkas")
+    parser.add_argument("--routed", action="store_true", help="Satu jawaban dari provider tercepat yang sehat (hedge & circuit breaker)")
+    parser.add_argument("--worker", default=DEFAULT_WORKER_URL, help=f"URL worker (default: ML_WORKER_URL atau {DEFAULT_WORKER_URL})")
+    args = parser.parse_args()
+
+    if not args.text and not args.target:
+        parser.error("isi path file / URL atau --text")
+    try:
+        if args.command == "analyze" and args.stream:
+            result = {}
+            for event in stream_analyze(args.target, args.text, service=args.service, timeout=args.timeout, worker_url=args.worker):
+                if event["type"] == "delta":
+                    print(event["text"], end="", flush=True)
+                elif event["type"] == "label":
+                    print(f"\n>>> Sentimen: {event['label'].upper()} (setelah {event['time']} detik)\n", flush=True)
+                elif event["type"] == "error":
+                    print(f"\nError: {event['error']}", file=sys.stderr)
+                elif event["type"] == "final":
+                    result = event
+            result.pop("result", None)
+        elif args.command == "analyze":
+            result = analyze(args.target, args.text, service=args.service, timeout=args.timeout, verbose=args.verbose,
+                             routed=args.routed, worker_url=args.worker)
+        elif args.command == "compare":
+            services = [s.strip() for s in args.services.split(",") if s.strip()] if args.services else None
+            result = compare(args.target, args.text, services=services, timeout=args.timeout, verbose=args.verbose,
+                             routed=args.routed, worker_url=args.worker)
+        else:
+            result = analyze_url(args.target, service=args.service, worker_url=args.worker)
+    except WorkerError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(result, indent=4, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()